@@ -1 +1 @@
-__version__ = "4.5.2"
+__version__ = "4.6.0"
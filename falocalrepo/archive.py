@@ -0,0 +1,150 @@
+from datetime import datetime
+from gzip import GzipFile
+from hashlib import sha1
+from json import dumps
+from json import loads
+from pathlib import Path
+from threading import Lock
+from typing import Any
+from typing import Callable
+from typing import Iterator
+from typing import Type
+
+from requests import ConnectionError
+from requests import PreparedRequest
+from requests import Response
+from requests import Session
+from requests.structures import CaseInsensitiveDict
+from requests.utils import get_encoding_from_headers
+
+chunk_size: int = 2 ** 20
+
+
+class RecordingStream:
+    def __init__(self, raw: Any, file: GzipFile, finish: Callable[[], Any]):
+        self.raw: Any = raw
+        self.file: GzipFile = file
+        self.finish: Callable[[], Any] = finish
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self.raw, name)
+
+    def stream(self, amt: int = chunk_size, decode_content: bool | None = None) -> Iterator[bytes]:
+        for chunk in self.raw.stream(amt, decode_content=decode_content):
+            self.file.write(chunk)
+            yield chunk
+        self.finish()
+
+    def close(self):
+        if not self.file.closed:
+            self.file.close()
+            Path(self.file.name).unlink(missing_ok=True)
+        self.raw.close()
+
+
+class ReplayStream:
+    def __init__(self, file: Path):
+        self.file: GzipFile = GzipFile(file, "rb")
+
+    def read(self, amt: int | None = -1) -> bytes:
+        if not (chunk := self.file.read(amt)):
+            self.file.close()
+        return chunk
+
+    def close(self):
+        self.file.close()
+
+
+class ResponseArchive:
+    index_name: str = "index.jsonl"
+
+    def __init__(self, folder: Path):
+        self.folder: Path = folder
+        self.index: dict[str, dict[str, Any]] = {}
+        self._lock: Lock = Lock()
+        if (index := self.folder / self.index_name).is_file():
+            with index.open() as f:
+                for entry in map(loads, filter(None, map(str.strip, f))):
+                    self.index[entry["key"]] = entry
+
+    @staticmethod
+    def key(request: PreparedRequest) -> str:
+        return sha1(f"{request.method} {request.url} {request.headers.get('Range', '')}".encode()).hexdigest()
+
+    def add(self, request: PreparedRequest, response: Response):
+        key: str = self.key(request)
+        self.folder.mkdir(parents=True, exist_ok=True)
+        part: Path = self.folder / f"{key}.gz.part"
+        file: GzipFile = GzipFile(part, "wb", compresslevel=6)
+
+        def finish():
+            size: int = file.tell()
+            file.close()
+            self.save_entry(request, response, key, part, size)
+
+        if response._content_consumed:
+            content: memoryview = memoryview(response.content or b"")
+            for i in range(0, len(content), chunk_size):
+                file.write(content[i:i + chunk_size])
+            finish()
+        else:
+            response.raw = RecordingStream(response.raw, file, finish)
+
+    def save_entry(self, request: PreparedRequest, response: Response, key: str, part: Path, size: int):
+        headers: dict[str, str] = dict(response.headers)
+        if headers.pop("Content-Encoding", None) is not None:
+            headers.pop("Transfer-Encoding", None)
+            headers["Content-Length"] = str(size)
+        entry: dict[str, Any] = {
+            "key": key,
+            "method": request.method,
+            "url": request.url,
+            "range": request.headers.get("Range", ""),
+            "status": response.status_code,
+            "reason": response.reason,
+            "headers": headers,
+            "file": f"{key}.gz",
+            "date": datetime.now().isoformat(timespec="seconds"),
+        }
+        with self._lock:
+            part.replace(self.folder / entry["file"])
+            with (self.folder / self.index_name).open("a") as f:
+                f.write(dumps(entry) + "\n")
+            self.index[key] = entry
+
+    def response(self, request: PreparedRequest) -> Response | None:
+        if (entry := self.index.get(self.key(request))) is None:
+            return None
+        response: Response = Response()
+        response.status_code = entry["status"]
+        response.reason = entry["reason"]
+        response.headers = CaseInsensitiveDict(entry["headers"])
+        response.encoding = get_encoding_from_headers(response.headers)
+        response.url = entry["url"]
+        response.request = request
+        response.raw = ReplayStream(self.folder / entry["file"])
+        return response
+
+
+def record_session(folder: Path) -> Type[Session]:
+    archive: ResponseArchive = ResponseArchive(folder)
+
+    class RecordSession(Session):
+        def send(self, request: PreparedRequest, **kwargs) -> Response:
+            response: Response = super().send(request, **kwargs)
+            archive.add(request, response)
+            return response
+
+    return RecordSession
+
+
+def replay_session(folder: Path) -> Type[Session]:
+    archive: ResponseArchive = ResponseArchive(folder)
+
+    class ReplaySession(Session):
+        def send(self, request: PreparedRequest, **kwargs) -> Response:
+            if (response := archive.response(request)) is None:
+                raise ConnectionError(f"No recorded response for {request.method} {request.url}", request=request)
+            return response
+
+    return ReplaySession
@@ -1,5 +1,6 @@
 from csv import writer as csv_writer
 from datetime import datetime
+from datetime import timedelta
 from enum import Enum
 from json import dumps
 from json import load
@@ -10,6 +11,7 @@ from re import compile as re_compile
 from re import match
 from re import sub
 from shutil import get_terminal_size
+from shutil import rmtree
 from sys import stderr
 from sys import stdout
 from textwrap import wrap
@@ -24,6 +26,7 @@ from click import BadParameter
 from click import Choice
 from click import Context
 from click import File
+from click import FloatRange
 from click import IntRange
 from click import Option
 from click import Parameter
@@ -46,6 +49,7 @@ from falocalrepo_database import Database
 from falocalrepo_database import Table
 from falocalrepo_database import __version__ as __database_version__
 from falocalrepo_database.database import query_to_sql
+from falocalrepo_database.selector import Selector
 from falocalrepo_database.selector import SelectorBuilder as Sb
 from falocalrepo_database.tables import CommentsColumns
 from falocalrepo_database.tables import HistoryColumns
@@ -75,7 +79,16 @@ from .util import get_param
 from .util import help_option
 from .. import __name__ as __prog_name__
 from ..__version__ import __version__
+from ..downloader import NegativeCacheColumns
+from ..downloader import NegativeCacheTable
+from ..downloader import file_store
+from ..downloader import file_store_setting
+from ..downloader import negative_cache_table
+from ..downloader import negative_cache_ttl
+from ..downloader import negative_cache_ttl_setting
+from ..downloader import release_file
 from ..downloader import sort_set
+from ..downloader import store_file
 
 
 class Output(str, Enum):
@@ -223,6 +236,21 @@ def get_table(db: Database, table: str) -> Table:
         return db[table]
 
 
+def release_replaced_files(db: Database, cursors: Iterable[Cursor]):
+    store: Path = file_store(db)
+    for cursor in cursors:
+        if cursor.table.name.lower() != submissions_table.lower():
+            continue
+        key: int = [c.name for c in cursor.columns].index(SubmissionsColumns.ID.name)
+        for entry in cursor.table.database.execute(cursor.query, cursor.query_values):
+            if entry[key] not in db.submissions:
+                continue
+            fs, t = db.submissions.get_submission_files(entry[key])
+            for f in filter(Path.is_file, [*(fs or []), *([t] if t else [])]):
+                if f.stat().st_nlink > 1:
+                    release_file(store, f)
+
+
 def print_table(ctx: Context, results: Cursor, headers: list[tuple[str, int]], ignore_width: bool) -> int:
     results_total: int = 0
     if ctx.color is not False:
@@ -465,7 +493,9 @@ def repair_submission(db: Database, submission: dict[str, Any], fix: bool, ctx:
     match [thumb, nt if (nt := folder / "thumbnail.jpg").is_file() else None, fix]:
         case [None, new_thumbnail, True] if new_thumbnail is not None:
             error = fixed = True
-            db.submissions.save_submission_thumbnail(id_, new_thumbnail.read_bytes())
+            thumbnail_bytes: bytes = new_thumbnail.read_bytes()
+            release_file(file_store(db), new_thumbnail)
+            db.submissions.save_submission_thumbnail(id_, thumbnail_bytes)
             db.submissions.set_filesaved(id_, filesaved & 0b100, filesaved & 0b010, True)
             db.commit()
             echo(f"{blue}{id_:010}{reset} {red}Thumbnail file found - fixed{reset}", color=ctx.color)
@@ -493,8 +523,10 @@ def repair_submission(db: Database, submission: dict[str, Any], fix: bool, ctx:
                     echo(f"{blue}{id_:010}{reset} {red}Missing file {i + 1}{reset}", color=ctx.color)
                 case [False, _, True]:
                     error = fixed = True
+                    file_bytes: bytes = new_file.read_bytes()
+                    release_file(file_store(db), new_file)
                     ext = db.submissions.save_submission_file(
-                        id_, new_file.read_bytes(), "submission",
+                        id_, file_bytes, "submission",
                         new_file.suffix.removeprefix(".") if "." in new_file.name else "", i)
                     db.submissions.update(Sb(SubmissionsColumns.ID.name) == id_,
                                           db.submissions.format_entry({
@@ -512,8 +544,10 @@ def repair_submission(db: Database, submission: dict[str, Any], fix: bool, ctx:
                 pass
             case [_, True]:
                 error = fixed = True
+                file_bytes: bytes = new_file.read_bytes()
+                release_file(file_store(db), new_file)
                 ext = db.submissions.save_submission_file(
-                    id_, new_file.read_bytes(), "submission",
+                    id_, file_bytes, "submission",
                     new_file.suffix.removeprefix(".") if "." in new_file.name else "", 0)
                 db.submissions.update(Sb(SubmissionsColumns.ID.name) == id_,
                                       db.submissions.format_entry({SubmissionsColumns.FILEEXT.name: [ext]},
@@ -701,6 +735,122 @@ def database_bbcode(ctx: Context, database: Callable[..., Database], bbcode: boo
         backup_database(db, ctx, "database")
 
 
+@database_app.command("file-store", short_help="Set content-addressed file store.")
+@argument("store", type=Choice(("true", "false")), required=False, default=None,
+          callback=lambda c, p, v: None if v is None else v == "true")
+@database_exists_option
+@color_option
+@help_option
+@pass_context
+@docstring_format()
+def database_file_store(ctx: Context, database: Callable[..., Database], store: bool | None = None):
+    """
+    Read or modify the file store setting of the database.
+
+    Use {cyan}true{reset} to enable the store and link existing submission files and thumbnails with the same content
+    together, and {cyan}false{reset} to disable it and remove the store folder. Submission files are never removed when
+    disabling the store.
+
+    Files in the store are hard links to the submission files, so the files folder must be on a file system that
+    supports them. Using {cyan}true{reset} when the store is already enabled checks all the files again and removes
+    unused entries from the store.
+    """
+
+    db: Database = database()
+
+    if store is not None:
+        backup_database(db, ctx, "predatabase")
+
+    if store:
+        db.settings[file_store_setting] = "true"
+        db.commit()
+        store_folder: Path = file_store(db)
+        total: int = len(db.submissions)
+        linked: int = 0
+        saved: int = 0
+        echo(f"Linking files to {yellow}{store_folder}{reset} ({total} submissions)", color=ctx.color)
+        for n, [id_] in enumerate(db.submissions.select(columns=[SubmissionsColumns.ID]).tuples, 1):
+            echo(f"\r{n}/{total}", nl=False)
+            fs, t = db.submissions.get_submission_files(id_)
+            for f in filter(Path.is_file, [*(fs or []), *([t] if t else [])]):
+                inode, size = (stat := f.stat()).st_ino, stat.st_size
+                if store_file(store_folder, f) is not None and f.stat().st_ino != inode:
+                    linked += 1
+                    saved += size
+        echo("\r" + (" " * ((len(str(total)) * 2) + 1)) + "\r", nl=False)
+        for stored in store_folder.glob("*/*") if store_folder.is_dir() else []:
+            if stored.stat().st_nlink < 2:
+                stored.unlink()
+        echo(f"Linked {yellow}{linked}{reset} duplicate files ({yellow}{saved / 2 ** 20:.2f}MiB{reset} saved)",
+             color=ctx.color)
+        add_history(db, ctx, store=store)
+    elif store is not None:
+        db.settings[file_store_setting] = "false"
+        rmtree(file_store(db), ignore_errors=True)
+        add_history(db, ctx, store=store)
+
+    echo(f"{blue}File Store{reset}: {yellow}{db.settings[file_store_setting] == 'true'}{reset}", color=ctx.color)
+
+    if store is not None:
+        backup_database(db, ctx, "database")
+
+
+@database_app.command("negative-cache", short_help="Show cached missing entries.")
+@option("--ttl", metavar="DAYS", type=FloatRange(0), default=None, help="Set cache duration.")
+@option("--expired", is_flag=True, default=False, help="Select expired entries only.")
+@option("--clear", is_flag=True, default=False, help="Clear entries.")
+@database_exists_option
+@color_option
+@help_option
+@pass_context
+@docstring_format()
+def database_negative_cache(ctx: Context, database: Callable[..., Database], ttl: float | None, expired: bool,
+                            clear: bool):
+    """
+    Show the submissions and journals that were not found or whose author was disabled during a download. Cached
+    entries are not requested again by download commands until they expire.
+
+    The {yellow}--ttl{reset} option sets for how many days the entries are kept in the cache (default 30),
+    {cyan}0{reset} disables the cache. The {yellow}--expired{reset} option selects only the entries older than the
+    cache duration.
+
+    Using the {yellow}--clear{reset} option will delete all cached entries, or the expired ones if the
+    {yellow}--expired{reset} option is used.
+    """
+
+    db: Database = database()
+    cache: NegativeCacheTable = NegativeCacheTable(db, negative_cache_table, NegativeCacheColumns.as_list())
+
+    if ttl is not None:
+        db.settings[negative_cache_ttl_setting] = f"{ttl:g}"
+        db.commit()
+        add_history(db, ctx, ttl=f"{ttl:g}")
+
+    if clear:
+        backup_database(db, ctx, "predatabase")
+
+    query: Selector | None = Sb(NegativeCacheColumns.ADDED.name) < NegativeCacheColumns.ADDED.to_entry(
+        datetime.now() - timedelta(days=negative_cache_ttl(db))) if expired else None
+    removed: int = 0
+
+    if clear and cache in db:
+        removed = (cache.delete(query) if query else db.execute(f"delete from {cache.name}")).rowcount
+        db.commit()
+    elif not clear:
+        entries: Iterable[tuple[str, int, int, datetime]] = cache.select(
+            query, order=[NegativeCacheColumns.ADDED.name]).tuples if cache in db else []
+        for t, i, e, a in entries:
+            echo(f"{blue}{a:%Y-%m-%d %H:%M}{reset} {t.lower()} {yellow}{i:010}{reset} " +
+                 ("NOT FOUND" if e == 1 else "DISABLED"), color=ctx.color)
+
+    if ttl is not None or not clear:
+        echo(f"{blue}TTL{reset}: {yellow}{negative_cache_ttl(db):g}{reset} days", color=ctx.color)
+
+    if clear:
+        echo(f"Removed {yellow}{removed}{reset} entries.", color=ctx.color)
+        backup_database(db, ctx, "database")
+
+
 @database_app.command("history", short_help="Show database history.")
 @option("--filter", "_filter", metavar="FILTER", type=str, default=None,
         help=f"Show entries containing {yellow}FILTER{reset}.")
@@ -975,10 +1125,8 @@ def database_remove(ctx: Context, database: Callable[..., Database], table: str,
                 echo(f"Deleted entry {yellow}{id_}{reset} from {table}.", color=ctx.color)
             finally:
                 db.commit()
-                for f in fs or []:
-                    f.unlink(missing_ok=True)
-                if t:
-                    t.unlink(missing_ok=True)
+                for f in [*(fs or []), *([t] if t else [])]:
+                    release_file(file_store(db), f)
         else:
             try:
                 del db_table[id_]
@@ -1037,11 +1185,8 @@ def database_add(ctx: Context, database: Callable[..., Database], table: str, fi
 
     if table.lower() == submissions_table.lower():
         sub_files_orig, sub_thumb_orig = db.submissions.get_submission_files(data["ID"])
-        if sub_files_orig:
-            for f in sub_files_orig:
-                f.unlink()
-        if sub_thumb_orig:
-            sub_thumb_orig.unlink()
+        for f in [*(sub_files_orig or []), *([sub_thumb_orig] if sub_thumb_orig else [])]:
+            release_file(file_store(db), f)
 
         sub_files: list[bytes] = [f.read_bytes() for f in submission_file]
         sub_thumb: bytes | None = submission_thumbnail.read_bytes() if submission_thumbnail else None
@@ -1127,14 +1272,17 @@ def database_edit(ctx: Context, database: Callable[..., Database], table: str, _
             if not add_submission_files and entry[SubmissionsColumns.FILEEXT.name]:
                 fs, _ = db.submissions.get_submission_files(_id)
                 for f in fs:
-                    f.unlink(missing_ok=True)
+                    release_file(file_store(db), f)
             exts: list[str] = entry[SubmissionsColumns.FILEEXT.name] if add_submission_files else []
             for n, f in enumerate(submission_file, len(exts)):
+                for stale in (db.submissions.files_folder / tiered_path(_id)).glob(f"submission{n or ''}.*"):
+                    release_file(file_store(db), stale)
                 exts.append(db.submissions.save_submission_file(_id, f.read_bytes(), "submission",
                                                                 f.suffix.removeprefix("."), n))
             filesaved = (filesaved & 0b001) + 0b110
             data |= {SubmissionsColumns.FILESAVED.name: filesaved, SubmissionsColumns.FILEEXT.name: exts}
         if submission_thumbnail:
+            release_file(file_store(db), db.submissions.files_folder / tiered_path(_id) / "thumbnail.jpg")
             db.submissions.save_submission_thumbnail(_id, submission_thumbnail.read_bytes())
             filesaved = (filesaved & 0b100) + (filesaved & 0b010) + 0b001
             data |= {SubmissionsColumns.FILESAVED.name: filesaved}
@@ -1212,6 +1360,8 @@ def database_copy(ctx: Context, database: Callable[..., Database], database_dest
     echo(f"Copying {', '.join(f'{yellow}{c.table.name}{reset}' for c in cursors)} to {yellow}{db2.path}{reset} ... ",
          nl=False, color=ctx.color)
 
+    if replace:
+        release_replaced_files(db2, cursors)
     db.copy(db2, *cursors, replace=replace)
     db.commit()
     add_history(db2, ctx, query=query, origin=db.path)
@@ -1263,6 +1413,8 @@ def database_merge(ctx: Context, database: Callable[..., Database], database_ori
     echo(f"Copying {', '.join(f'{yellow}{c.table.name}{reset}' for c in cursors)} from {yellow}{db2.path}{reset} ... ",
          nl=False, color=ctx.color)
 
+    if replace:
+        release_replaced_files(db, cursors)
     db.merge(db2, *cursors, replace=replace)
     db.commit()
     add_history(db, ctx, query=query, origin=db2.path)
@@ -1400,7 +1552,9 @@ def database_upgrade(ctx: Context, database: Callable[..., Database]):
 database_app.list_commands = lambda *_: [
     database_info.name,
     database_bbcode.name,
+    database_file_store.name,
     database_history.name,
+    database_negative_cache.name,
     database_search.name,
     database_view.name,
     database_add.name,
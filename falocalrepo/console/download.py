@@ -1,11 +1,14 @@
+from pathlib import Path
 from typing import Callable
 from typing import TextIO
 
 from click import BadParameter
 from click import Context
 from click import File
+from click import FloatRange
 from click import IntRange
 from click import Option
+from click import Path as PathClick
 from click import argument
 from click import echo
 from click import group
@@ -29,6 +32,8 @@ from .util import database_exists_option
 from .util import docstring_format
 from .util import help_option
 from .util import open_api
+from .util import open_rate_limiter
+from ..downloader import BudgetExhausted
 from ..downloader import Downloader
 from ..downloader import Folder
 from ..downloader import sort_set
@@ -70,6 +75,23 @@ retry_option = option("--retry", metavar="INTEGER", default=1, type=IntRange(1,
                       help="Retry downloads.")
 comments_option = option("--no-comments", "save_comments", is_flag=True, default=True, help="Do not save comments.")
 content_only_option = option("--content-only", is_flag=True, default=False, help="Do not save headers and footers.")
+workers_option = option("--workers", metavar="INTEGER", default=1, type=IntRange(1, 10), show_default=True,
+                        help="Concurrent downloads.")
+parsers_option = option("--parsers", metavar="INTEGER", default=0, type=IntRange(0, 10), show_default=True,
+                        help=f"Parse submission pages in separate processes (requires {yellow}--workers{reset}).")
+resume_option = option("--resume", is_flag=True, default=False, help="Resume interrupted download.")
+max_duration_option = option("--max-duration", metavar="SECONDS", type=IntRange(1), default=None,
+                             help="Stop after the given time.")
+max_requests_option = option("--max-requests", metavar="INTEGER", type=IntRange(1), default=None,
+                             help="Stop after the given number of requests.")
+record_option = option("--record", metavar="DIR", default=None,
+                       type=PathClick(file_okay=False, writable=True, resolve_path=True, path_type=Path),
+                       help="Save HTTP responses to a folder.")
+replay_option = option("--replay", metavar="DIR", default=None,
+                       type=PathClick(exists=True, file_okay=False, resolve_path=True, path_type=Path),
+                       help="Read HTTP responses from a recorded folder.")
+defer_files_option = option("--defer-files", is_flag=True, default=False,
+                            help="Save metadata only and queue files for backfill.")
 
 
 def users_callback(ctx: Context, param: Option, value: tuple[str, ...]) -> tuple[str, ...]:
@@ -104,10 +126,18 @@ def download_app():
 @option("--folder", "-f", "folders", metavar="FOLDER", required=True, multiple=True, type=DownloadFolderChoice(),
         callback=lambda _c, _p, v: sort_set(v), help="Folder to download.")
 @retry_option
+@workers_option
+@parsers_option
 @comments_option
 @content_only_option
 @option("--replace", is_flag=True, default=False, show_default=True, help="Replace entries already in database.")
+@defer_files_option
+@resume_option
+@max_duration_option
+@max_requests_option
 @dry_run_option
+@record_option
+@replay_option
 @verbose_report_option
 @report_file_option
 @database_exists_option
@@ -118,7 +148,9 @@ def download_app():
                             [Folder.watchlist_by + f":{yellow}FOLDER{reset}"] +
                             [Folder.watchlist_to + f":{yellow}FOLDER{reset}"]))
 def download_users(ctx: Context, database: Callable[..., Database], users: tuple[str], folders: tuple[str],
-                   retry: int | None, save_comments: bool, content_only: bool, replace: bool, dry_run: bool,
+                   retry: int | None, workers: int, parsers: int, save_comments: bool, content_only: bool,
+                   replace: bool, defer_files: bool, resume: bool, max_duration: int | None,
+                   max_requests: int | None, dry_run: bool, record: Path | None, replay: Path | None,
                    verbose_report: bool, report_file: TextIO | None):
     """
     Download specific user folders, where {yellow}FOLDER{reset} is one of {0}. Multiple {yellow}--user{reset} and
@@ -128,20 +160,45 @@ def download_users(ctx: Context, database: Callable[..., Database], users: tuple
 
     The {yellow}--retry{reset} option enables downloads retries for submission files and thumbnails up to 5 retries.
 
+    The {yellow}--workers{reset} option allows downloading up to 10 submission files and thumbnails at the same time,
+    and fetching the next folder pages and the folders of upcoming users in the background.
+
+    The {yellow}--parsers{reset} option parses submission pages in up to 10 separate processes while the next pages
+    are fetched. It requires {yellow}--workers{reset} and is not used with {yellow}--replace{reset} or
+    {yellow}--defer-files{reset}.
+
     The {yellow}--no-comments{reset} option disables saving comments for submissions and journals.
 
     The {yellow}--content-only{reset} option disables saving headers and footers.
 
     If the {yellow}--replace{reset} option is used, existing entries in the database will be updated (favorites are
-    maintained).
+    maintained). Entries and files that have not changed since they were last downloaded are not saved again.
+
+    The {yellow}--defer-files{reset} option saves the submissions without their files and thumbnails, and adds them to
+    the queue of pending files instead. Pending files can be downloaded later with the {yellow}backfill{reset} command.
+
+    The {yellow}--resume{reset} option continues an interrupted download from the last saved page, skipping users
+    that were already completed. The checkpoint is only used if the previous run was of the same type.
+
+    The {yellow}--max-duration{reset} and {yellow}--max-requests{reset} options stop the download cleanly after the
+    given number of seconds or requests. The position is saved and can be continued with {yellow}--resume{reset}.
 
     The optional {yellow}--dry-run{reset} option disables downloading and saving and simply lists fetched entries.
     Users are not added/deactivated.
+
+    The {yellow}--record{reset} option saves the HTTP responses received during the download to {yellow}DIR{reset},
+    and the {yellow}--replay{reset} option reads them back from a recorded {yellow}DIR{reset} without connecting to the
+    server.
     """
+    if parsers and workers == 1:
+        raise BadParameter("Requires --workers greater than 1", ctx, param_hint=repr("--parsers"))
     db: Database = database()
-    api: FAAPI = open_api(db, ctx)
+    api: FAAPI = open_api(db, ctx, record=record, replay=replay)
     downloader: Downloader = Downloader(db, api, color=ctx.color, comments=save_comments, content_only=content_only,
-                                        retry=retry or 0, replace=replace, dry_run=dry_run)
+                                        retry=retry or 0, replace=replace, dry_run=dry_run, workers=workers,
+                                        parsers=parsers, limiter=open_rate_limiter(api, replay),
+                                        max_duration=max_duration, max_requests=max_requests,
+                                        defer_files=defer_files)
     if not dry_run:
         backup_database(db, ctx, "predownload")
         add_history(db, ctx, users=users, folders=folders)
@@ -157,10 +214,12 @@ def download_users(ctx: Context, database: Callable[..., Database], users: tuple
                         f"{Folder.watchlist_to}:{':'.join(watchlist_to)}")
     folders = folders_
     try:
-        downloader.download_users(list(users), list(folders))
+        downloader.download_users(list(users), list(folders), resume)
     except KeyboardInterrupt:
         echo()
         raise
+    except BudgetExhausted:
+        secho("\nBudget exhausted, continue with --resume.", fg="yellow", color=ctx.color)
     except Unauthorized as err:
         secho(f"\nError: Unauthorized{(': ' + ' '.join(err.args)) if err.args else ''}", fg="red", color=ctx.color)
         ctx.exit(1)
@@ -168,6 +227,7 @@ def download_users(ctx: Context, database: Callable[..., Database], users: tuple
         secho(f"\nError: An error occurred during download: {err!r}.", fg="red", color=ctx.color)
         ctx.exit(1)
     finally:
+        downloader.close()
         if report := downloader.verbose_report() if verbose_report else downloader.report():
             echo(f"\n{report}\n", color=ctx.color)
         if report_file:
@@ -183,12 +243,26 @@ def download_users(ctx: Context, database: Callable[..., Database], users: tuple
         callback=lambda _c, _p, v: sort_set(v), help="Folder to update.")
 @option("--stop", metavar="STOP", type=IntRange(0, min_open=True), default=1, show_default=True,
         help="Number of submissions to find in the database before stopping.")
+@option("--since-update", is_flag=True, default=False, help="Stop at entries older than the last update.")
 @option("--deactivated", is_flag=True, default=False, help="Check deactivated users.")
 @option("--like", is_flag=True, is_eager=True, default=False, help=f"Consider {yellow}USER{reset} to be LIKE queries.")
+@option("--probe", is_flag=True, default=False, help="Skip folders with unchanged user statistics.")
+@option("--from-inbox", is_flag=True, default=False, help="Download new entries from the notifications inbox.")
+@option("--priority", is_flag=True, default=False, help="Update users with the highest expected yield first.")
+@option("--min-yield", metavar="FLOAT", type=FloatRange(0), default=0, show_default=True,
+        help=f"Skip users with a lower expected yield (requires {yellow}--priority{reset}).")
 @retry_option
+@workers_option
+@parsers_option
 @comments_option
 @content_only_option
+@defer_files_option
+@resume_option
+@max_duration_option
+@max_requests_option
 @dry_run_option
+@record_option
+@replay_option
 @verbose_report_option
 @report_file_option
 @database_exists_option
@@ -197,8 +271,11 @@ def download_users(ctx: Context, database: Callable[..., Database], users: tuple
 @pass_context
 @docstring_format(', '.join(c.value for c in UpdateFolderChoice.completion_items))
 def download_update(ctx: Context, database: Callable[..., Database], users: tuple[str], folders: tuple[str], stop: int,
-                    deactivated: bool, like: bool, retry: int | None, save_comments: bool, content_only: bool,
-                    dry_run: bool, verbose_report: bool, report_file: TextIO | None):
+                    since_update: bool, deactivated: bool, like: bool, probe: bool, from_inbox: bool, priority: bool,
+                    min_yield: float, retry: int | None, workers: int, parsers: int, save_comments: bool,
+                    content_only: bool, defer_files: bool, resume: bool, max_duration: int | None,
+                    max_requests: int | None, dry_run: bool, record: Path | None, replay: Path | None,
+                    verbose_report: bool, report_file: TextIO | None):
     """
     Download new entries using the users and folders already in the database. {yellow}--user{reset} and
     {yellow}--folder{reset} options can be used to restrict the update to specific users and or folders, where
@@ -211,30 +288,79 @@ def download_update(ctx: Context, database: Callable[..., Database], users: tupl
     The {yellow}--stop{reset} option allows setting after how many entries of each folder should be found in the
     database before stopping the update.
 
+    Gallery, scraps, and journals updates also stop as soon as an entry at or below the highest ID found by the last
+    download of the folder is reached.
+
+    The {yellow}--since-update{reset} option also stops the update of a folder as soon as an entry older than the start
+    of its last successful update is reached. Favorites are stopped after the first page that reaches the favorites
+    found by the last update instead, as they are sorted by the date they were faved.
+
     The {yellow}--like{reset} option enables using SQLite LIKE statements for {yellow}USER{reset} values, allowing to
     select multiple users at once.
 
+    The {yellow}--probe{reset} option fetches the userpage of each user first and skips the gallery, scraps, favorites,
+    and journals folders if the number of submissions, favorites, or journals has not changed since the last update.
+
+    The {yellow}--from-inbox{reset} option reads the new submissions and journals notifications of the logged-in account
+    instead of crawling each user, and downloads the entries of users in the database that have a gallery, scraps, or
+    journals folder. The {yellow}--stop{reset} option applies to the notifications pages.
+
+    The {yellow}--priority{reset} option sorts users and their folders by expected yield, calculated from the upload
+    rate of the user over the last year, the time since the folder was last checked, and how often previous checks found
+    new entries. Folders that were never checked come first. The {yellow}--min-yield{reset} option skips users whose
+    expected number of new entries is lower than the given value, so they are checked less often.
+
     The {yellow}--retry{reset} option enables downloads retries for submission files and thumbnails up to 5 retries.
 
+    The {yellow}--workers{reset} option allows downloading up to 10 submission files and thumbnails at the same time,
+    and fetching the next folder pages and the folders of upcoming users in the background.
+
+    The {yellow}--parsers{reset} option parses submission pages in up to 10 separate processes while the next pages
+    are fetched. It requires {yellow}--workers{reset} and is not used with {yellow}--defer-files{reset}.
+
     The {yellow}--no-comments{reset} option disables saving comments for submissions and journals.
 
     The {yellow}--content-only{reset} option disables saving headers and footers.
 
+    The {yellow}--defer-files{reset} option saves the submissions without their files and thumbnails, and adds them to
+    the queue of pending files instead. Pending files can be downloaded later with the {yellow}backfill{reset} command.
+
+    The {yellow}--resume{reset} option continues an interrupted download from the last saved page, skipping users
+    that were already completed. The checkpoint is only used if the previous run was of the same type.
+
+    The {yellow}--max-duration{reset} and {yellow}--max-requests{reset} options stop the download cleanly after the
+    given number of seconds or requests. The position is saved and can be continued with {yellow}--resume{reset}.
+
     The optional {yellow}--dry-run{reset} option disables downloading and saving and simply lists fetched entries.
     Users are not added/deactivated.
+
+    The {yellow}--record{reset} option saves the HTTP responses received during the download to {yellow}DIR{reset},
+    and the {yellow}--replay{reset} option reads them back from a recorded {yellow}DIR{reset} without connecting to the
+    server.
     """
+    if parsers and workers == 1:
+        raise BadParameter("Requires --workers greater than 1", ctx, param_hint=repr("--parsers"))
+    elif min_yield and not priority:
+        raise BadParameter("Requires --priority", ctx, param_hint=repr("--min-yield"))
     db: Database = database()
-    api: FAAPI = open_api(db, ctx)
+    api: FAAPI = open_api(db, ctx, record=record, replay=replay)
     downloader: Downloader = Downloader(db, api, color=ctx.color, comments=save_comments, content_only=content_only,
-                                        retry=retry or 0, dry_run=dry_run)
+                                        retry=retry or 0, dry_run=dry_run, workers=workers,
+                                        parsers=parsers, limiter=open_rate_limiter(api, replay),
+                                        max_duration=max_duration, max_requests=max_requests,
+                                        defer_files=defer_files)
     if not dry_run:
         backup_database(db, ctx, "predownload")
         add_history(db, ctx, users=users, folders=folders, stop=stop)
     try:
-        downloader.download_users_update(list(users), list(folders), stop, deactivated, like)
+        downloader.download_users_update(list(users), list(folders), stop, deactivated, like, resume, probe,
+                                         from_inbox, priority, min_yield, since_update)
     except KeyboardInterrupt:
         echo()
         raise
+    except BudgetExhausted:
+        secho("\nBudget exhausted." if from_inbox else "\nBudget exhausted, continue with --resume.", fg="yellow",
+              color=ctx.color)
     except Unauthorized as err:
         secho(f"\nError: Unauthorized{(': ' + ' '.join(err.args)) if err.args else ''}", fg="red", color=ctx.color)
         ctx.exit(1)
@@ -242,6 +368,7 @@ def download_update(ctx: Context, database: Callable[..., Database], users: tupl
         secho(f"\nError: An error occurred during download: {err!r}.", fg="red", color=ctx.color)
         ctx.exit(1)
     finally:
+        downloader.close()
         if report := downloader.verbose_report() if verbose_report else downloader.report():
             echo(f"\n{report}\n", color=ctx.color)
         if report_file:
@@ -255,9 +382,14 @@ def download_update(ctx: Context, database: Callable[..., Database], users: tupl
           callback=lambda _c, _p, v: sorted(set(v), key=v.index))
 @option("--replace", is_flag=True, default=False, show_default=True, help="Replace submissions already in database.")
 @retry_option
+@workers_option
+@parsers_option
 @comments_option
 @option("--content-only", is_flag=True, default=False, help="Do not save footers.")
+@defer_files_option
 @dry_run_option
+@record_option
+@replay_option
 @verbose_report_option
 @report_file_option
 @database_exists_option
@@ -266,26 +398,44 @@ def download_update(ctx: Context, database: Callable[..., Database], users: tupl
 @pass_context
 @docstring_format()
 def download_submissions(ctx: Context, database: Callable[..., Database], submission_id: tuple[int], replace: bool,
-                         retry: int | None, save_comments: bool, content_only: bool, dry_run: bool,
+                         retry: int | None, workers: int, parsers: int, save_comments: bool, content_only: bool,
+                         defer_files: bool, dry_run: bool, record: Path | None, replay: Path | None,
                          verbose_report: bool, report_file: TextIO | None):
     """
     Download single submissions, where {yellow}SUBMISSION_ID{reset} is the ID of the submission.
 
     If the {yellow}--replace{reset} option is used, database entries will be overwritten with new data (favorites will
-    be maintained).
+    be maintained). Entries and files that have not changed since they were last downloaded are not saved again.
 
     The {yellow}--retry{reset} option enables downloads retries for submission files and thumbnails up to 5 retries.
 
+    The {yellow}--workers{reset} option allows downloading up to 10 submission files and thumbnails at the same time.
+
+    The {yellow}--parsers{reset} option parses submission pages in up to 10 separate processes while the next pages
+    are fetched. It requires {yellow}--workers{reset} and is not used with {yellow}--replace{reset} or
+    {yellow}--defer-files{reset}.
+
     The {yellow}--no-comments{reset} option disables saving comments.
 
     The {yellow}--content-only{reset} option disables saving footers.
 
+    The {yellow}--defer-files{reset} option saves the submissions without their files and thumbnails, and adds them to
+    the queue of pending files instead. Pending files can be downloaded later with the {yellow}backfill{reset} command.
+
     The optional {yellow}--dry-run{reset} option disables downloading and saving and simply lists fetched entries
+
+    The {yellow}--record{reset} option saves the HTTP responses received during the download to {yellow}DIR{reset},
+    and the {yellow}--replay{reset} option reads them back from a recorded {yellow}DIR{reset} without connecting to the
+    server.
     """
+    if parsers and workers == 1:
+        raise BadParameter("Requires --workers greater than 1", ctx, param_hint=repr("--parsers"))
     db: Database = database()
-    api: FAAPI = open_api(db, ctx)
+    api: FAAPI = open_api(db, ctx, record=record, replay=replay)
     downloader: Downloader = Downloader(db, api, color=ctx.color, comments=save_comments, content_only=content_only,
-                                        retry=retry or 0, replace=replace, dry_run=dry_run)
+                                        retry=retry or 0, replace=replace, dry_run=dry_run, workers=workers,
+                                        parsers=parsers, limiter=open_rate_limiter(api, replay),
+                                        defer_files=defer_files)
     if not dry_run:
         backup_database(db, ctx, "predownload")
         add_history(db, ctx, submission_id=submission_id, replace=replace)
@@ -301,6 +451,7 @@ def download_submissions(ctx: Context, database: Callable[..., Database], submis
         secho(f"\nError: An error occurred during download: {err!r}.", fg="red", color=ctx.color)
         ctx.exit(1)
     finally:
+        downloader.close()
         if report := downloader.verbose_report() if verbose_report else downloader.report():
             echo(f"\n{report}\n", color=ctx.color)
         if report_file:
@@ -316,6 +467,8 @@ def download_submissions(ctx: Context, database: Callable[..., Database], submis
 @comments_option
 @content_only_option
 @dry_run_option
+@record_option
+@replay_option
 @verbose_report_option
 @report_file_option
 @database_exists_option
@@ -324,24 +477,28 @@ def download_submissions(ctx: Context, database: Callable[..., Database], submis
 @pass_context
 @docstring_format()
 def download_journals(ctx: Context, database: Callable[..., Database], journal_id: tuple[int], replace: bool,
-                      save_comments: bool, content_only: bool, dry_run: bool, verbose_report: bool,
-                      report_file: TextIO | None):
+                      save_comments: bool, content_only: bool, dry_run: bool, record: Path | None,
+                      replay: Path | None, verbose_report: bool, report_file: TextIO | None):
     """
     Download single journals, where {yellow}JOURNAL_ID{reset} is the ID of the journal.
 
     If the {yellow}--replace{reset} option is used, database entries will be overwritten with new data (favorites will
-    be maintained).
+    be maintained). Entries that have not changed since they were last downloaded are not saved again.
 
     The {yellow}--no-comments{reset} option disables saving comments.
 
     The {yellow}--content-only{reset} option disables saving headers and footers.
 
     The optional {yellow}--dry-run{reset} option disables downloading and saving and simply lists fetched entries.
+
+    The {yellow}--record{reset} option saves the HTTP responses received during the download to {yellow}DIR{reset},
+    and the {yellow}--replay{reset} option reads them back from a recorded {yellow}DIR{reset} without connecting to the
+    server.
     """
     db: Database = database()
-    api: FAAPI = open_api(db, ctx)
+    api: FAAPI = open_api(db, ctx, record=record, replay=replay)
     downloader: Downloader = Downloader(db, api, color=ctx.color, comments=save_comments, content_only=content_only,
-                                        replace=replace, dry_run=dry_run)
+                                        replace=replace, dry_run=dry_run, limiter=open_rate_limiter(api, replay))
     if not dry_run:
         backup_database(db, ctx, "predownload")
         add_history(db, ctx, journal_id=journal_id, replace=replace)
@@ -357,6 +514,82 @@ def download_journals(ctx: Context, database: Callable[..., Database], journal_i
         secho(f"\nError: An error occurred during download: {err!r}.", fg="red", color=ctx.color)
         ctx.exit(1)
     finally:
+        downloader.close()
+        if report := downloader.verbose_report() if verbose_report else downloader.report():
+            echo(f"\n{report}\n", color=ctx.color)
+        if report_file:
+            downloader.verbose_report(report_file)
+        backup_database(db, ctx, "download")
+
+
+# noinspection DuplicatedCode
+@download_app.command("backfill", short_help="Download pending submission files.")
+@option("--missing", is_flag=True, default=False, help="Download missing files of all submissions.")
+@retry_option
+@workers_option
+@max_duration_option
+@max_requests_option
+@dry_run_option
+@record_option
+@replay_option
+@verbose_report_option
+@report_file_option
+@database_exists_option
+@color_option
+@help_option
+@pass_context
+@docstring_format()
+def download_backfill(ctx: Context, database: Callable[..., Database], missing: bool, retry: int | None,
+                      workers: int, max_duration: int | None, max_requests: int | None, dry_run: bool,
+                      record: Path | None, replay: Path | None, verbose_report: bool, report_file: TextIO | None):
+    """
+    Download the files and thumbnails of submissions saved with the {yellow}--defer-files{reset} option. Submissions
+    whose file could not be downloaded are kept in the queue for the next backfill. Files queued while the backfill is
+    running are downloaded as well.
+
+    The {yellow}--missing{reset} option also selects all submissions whose file or thumbnail is missing according to
+    their {cyan}FILESAVED{reset} value. Only the missing file is downloaded from its saved URL, and the thumbnail URL is
+    derived from it, without fetching the submission page again.
+
+    The backfill can run at the same time as other download commands if the
+    {yellow}FALOCALREPO_MULTI_CONNECTION{reset} environment variable is set.
+
+    The {yellow}--retry{reset} option enables downloads retries for submission files and thumbnails up to 5 retries.
+
+    The {yellow}--workers{reset} option allows downloading up to 10 submission files and thumbnails at the same time.
+
+    The {yellow}--max-duration{reset} and {yellow}--max-requests{reset} options stop the backfill cleanly after the
+    given number of seconds or requests. Remaining files stay in the queue.
+
+    The optional {yellow}--dry-run{reset} option disables downloading and saving and simply lists pending entries.
+
+    The {yellow}--record{reset} option saves the HTTP responses received during the download to {yellow}DIR{reset},
+    and the {yellow}--replay{reset} option reads them back from a recorded {yellow}DIR{reset} without connecting to the
+    server.
+    """
+    db: Database = database()
+    api: FAAPI = open_api(db, ctx, record=record, replay=replay)
+    downloader: Downloader = Downloader(db, api, color=ctx.color, retry=retry or 0, dry_run=dry_run, workers=workers,
+                                        limiter=open_rate_limiter(api, replay),
+                                        max_duration=max_duration, max_requests=max_requests)
+    if not dry_run:
+        backup_database(db, ctx, "predownload")
+        add_history(db, ctx, missing=missing)
+    try:
+        downloader.download_backfill(missing)
+    except KeyboardInterrupt:
+        echo()
+        raise
+    except BudgetExhausted:
+        secho("\nBudget exhausted.", fg="yellow", color=ctx.color)
+    except Unauthorized as err:
+        secho(f"\nError: Unauthorized{(': ' + ' '.join(err.args)) if err.args else ''}", fg="red", color=ctx.color)
+        ctx.exit(1)
+    except RequestException as err:
+        secho(f"\nError: An error occurred during download: {err!r}.", fg="red", color=ctx.color)
+        ctx.exit(1)
+    finally:
+        downloader.close()
         if report := downloader.verbose_report() if verbose_report else downloader.report():
             echo(f"\n{report}\n", color=ctx.color)
         if report_file:
@@ -369,4 +602,5 @@ download_app.list_commands = lambda *_: [
     download_update.name,
     download_submissions.name,
     download_journals.name,
+    download_backfill.name,
 ]
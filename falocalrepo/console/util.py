@@ -28,11 +28,15 @@ from click_help_colors import HelpColorsGroup
 from faapi import FAAPI
 from falocalrepo_database import Database
 from requests import Response
+from requests import Session
 from requests import get
 from wcwidth import wcwidth
 
 from .colors import *
 from .. import __name__ as __prog_name__
+from ..archive import record_session
+from ..archive import replay_session
+from ..ratelimit import RateLimiter
 
 __prog_name__ = __prog_name__.split('/')[-1].split('\\')[-1].strip().upper()
 _envar_database: str = f"{__prog_name__}_DATABASE"
@@ -40,7 +44,9 @@ _envar_no_color: str = f"{__prog_name__}_NOCOLOR"
 _envar_multi_connection: str = f"{__prog_name__}_MULTI_CONNECTION"
 _envar_craw_delay: str = f"{__prog_name__}_CRAWL_DELAY"
 _envar_fa_root: str = f"{__prog_name__}_FA_ROOT"
+_envar_rate_limit: str = f"{__prog_name__}_RATE_LIMIT"
 _cookies_setting: str = "COOKIES"
+_multi_connection_busy_timeout: int = 60000
 _help_option_names: list[str] = ["--help", "-h"]
 
 
@@ -92,6 +98,8 @@ class EnvVars:
     MULTI_CONNECTION: bool = environ.get(_envar_multi_connection, None) is not None
     CRAWL_DELAY: int | None = int(e) if (e := environ.get(_envar_craw_delay, None)) is not None else None
     FA_ROOT: str | None = environ.get(_envar_fa_root, None)
+    RATE_LIMIT: tuple[float, float] | None = (float((r := e.split(",", 1))[0]), float(r[-1])) \
+        if (e := environ.get(_envar_rate_limit, None)) is not None else None
 
     @classmethod
     def print_database(cls, file: TextIO = stderr):
@@ -118,6 +126,11 @@ class EnvVars:
         if cls.FA_ROOT is not None:
             echo(f"Using {_envar_fa_root}: {cls.FA_ROOT}", file=file)
 
+    @classmethod
+    def print_rate_limit(cls, file: TextIO = stderr):
+        if cls.RATE_LIMIT is not None:
+            echo(f"Using {_envar_rate_limit}: {cls.RATE_LIMIT[0]:g},{cls.RATE_LIMIT[1]:g}", file=file)
+
 
 def open_database(path: Path, *, ctx: Context, param: Parameter, check_init: bool = True,
                   check_version: bool = True, print_envvar: bool = True) -> Database:
@@ -144,6 +157,9 @@ def open_database(path: Path, *, ctx: Context, param: Parameter, check_init: boo
 
     db: Database = Database(path, check_version=False, check_connections=False)
 
+    if EnvVars.MULTI_CONNECTION:
+        db.connection.execute(f"PRAGMA busy_timeout = {_multi_connection_busy_timeout}")
+
     if check_init and not db.is_formatted:
         from .app import app, app_init
         raise BadParameter(f"Database is not initialised.\n\nInitialise using '{app.name} {app_init.name}'.",
@@ -177,7 +193,8 @@ def backup_database(db: Database, ctx: Context, trigger: str):
     echo("Done")
 
 
-def open_api(db: Database, ctx: Context = None, *, check_login: bool = True) -> FAAPI:
+def open_api(db: Database, ctx: Context = None, *, check_login: bool = True, record: Path | None = None,
+             replay: Path | None = None) -> FAAPI:
     if not (cookies := read_cookies(db)):
         from .app import app
         from .config import config_app, config_cookies
@@ -185,13 +202,19 @@ def open_api(db: Database, ctx: Context = None, *, check_login: bool = True) ->
                            f"\n\nSet using '{app.name} {config_app.name} {config_cookies.name}'",
                            ctx, param_hint=repr("--database"))
 
-    api: FAAPI = FAAPI(cookies)
+    if record and replay:
+        raise BadParameter("Cannot be used together with '--record'", ctx, param_hint=repr("--replay"))
+
+    api: FAAPI = FAAPI(cookies, session_class=replay_session(replay) if replay else
+                       record_session(record) if record else Session)
 
     if EnvVars.CRAWL_DELAY is not None:
         EnvVars.print_crawl_delay()
         if EnvVars.CRAWL_DELAY < (delay := int(api.crawl_delay or 0)):
             raise BadParameter(f"Value lower than allowed ({delay})", param_hint=_envar_craw_delay)
         api.robots.crawl_delay = lambda *_: EnvVars.CRAWL_DELAY
+    if replay:
+        api.handle_delay = lambda: None
     if EnvVars.FA_ROOT is not None:
         EnvVars.print_fa_root()
         faapi.connection.root = EnvVars.FA_ROOT
@@ -207,6 +230,20 @@ def open_api(db: Database, ctx: Context = None, *, check_login: bool = True) ->
     return api
 
 
+def open_rate_limiter(api: FAAPI, replay: Path | None = None) -> RateLimiter | None:
+    if EnvVars.RATE_LIMIT is None or replay:
+        return None
+
+    EnvVars.print_rate_limit()
+    pages, files = EnvVars.RATE_LIMIT
+    if pages <= 0 or files <= 0:
+        raise BadParameter("Rates must be greater than 0", param_hint=_envar_rate_limit)
+    elif api.crawl_delay and pages > (rate := 1 / api.crawl_delay):
+        raise BadParameter(f"Pages rate higher than allowed ({rate:g})", param_hint=_envar_rate_limit)
+
+    return RateLimiter({RateLimiter.pages: pages, RateLimiter.files: files})
+
+
 def read_cookies(db: Database) -> list[dict[str, str]]:
     if not (cs := db.settings[_cookies_setting]):
         return []
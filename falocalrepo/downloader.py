@@ -1,7 +1,28 @@
+from concurrent.futures import Future
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from datetime import timedelta
 from enum import Enum
+from functools import partial
+from hashlib import sha1
+from hashlib import sha256
 from json import dump
+from json import dumps
+from json import loads
+from multiprocessing import get_context
 from operator import itemgetter
+from os import link
+from pathlib import Path
+from random import uniform
+from re import match
+from re import search
 from shutil import get_terminal_size
+from threading import Lock
+from threading import current_thread
+from threading import main_thread
+from time import monotonic
+from time import sleep
 from typing import Any
 from typing import Callable
 from typing import Iterable
@@ -18,25 +39,42 @@ from faapi import Submission
 from faapi import SubmissionPartial
 from faapi import UserPartial
 from faapi.comment import flatten_comments
+from faapi.connection import join_url
 from faapi.exceptions import DisabledAccount
 from faapi.exceptions import NotFound
 from faapi.exceptions import NoticeMessage
 from faapi.exceptions import ServerError
+from faapi.exceptions import Unauthorized
 from faapi.journal import JournalPartial
+from faapi.parse import check_page_raise
+from faapi.parse import parse_loggedin_user
+from faapi.parse import parse_page
+from faapi.parse import parse_submission_figures
 from falocalrepo_database import Column
 from falocalrepo_database import Database
+from falocalrepo_database import Table
 from falocalrepo_database.selector import SelectorBuilder as Sb
+from falocalrepo_database.tables import Columns
 from falocalrepo_database.tables import CommentsColumns
 from falocalrepo_database.tables import JournalsColumns
 from falocalrepo_database.tables import SubmissionsColumns
 from falocalrepo_database.tables import UsersColumns
 from falocalrepo_database.tables import journals_table
 from falocalrepo_database.tables import submissions_table
+from falocalrepo_database.util import clean_username
+from falocalrepo_database.util import guess_extension
+from falocalrepo_database.util import tiered_path
+from requests import ConnectionError
+from requests import HTTPError
 from requests import RequestException
 from requests import Response
+from requests import Timeout
+from requests.adapters import HTTPAdapter
 
 from .console.colors import *
+from .console.util import EnvVars
 from .console.util import clean_string
+from .ratelimit import RateLimiter
 
 filterwarnings("ignore", category=bs4.MarkupResemblesLocatorWarning, module="bs4")
 
@@ -45,6 +83,22 @@ _FolderDownloader = Callable[[str, int | str], tuple[list[SubmissionPartial], st
 T = TypeVar("T")
 P = TypeVar("P")
 
+chunk_size: int = 2 ** 20
+checkpoint_setting: str = "DOWNLOADCHECKPOINT"
+checkpoint_table: str = "DOWNLOADCHECKPOINT"
+file_store_setting: str = "FILESTORE"
+folder_state_table: str = "FOLDERSTATE"
+negative_cache_table: str = "NEGATIVECACHE"
+negative_cache_ttl_setting: str = "NEGATIVECACHETTL"
+negative_cache_ttl_default: float = 30
+file_queue_table: str = "FILEQUEUE"
+fingerprints_table: str = "FINGERPRINTS"
+error_messages: dict[int, str] = {1: "NOT FOUND", 2: "NOT ACTIVE", 3: "SERVER ERR", 4: "NOTICE"}
+
+
+class BudgetExhausted(Exception):
+    pass
+
 
 class OutputType(int, Enum):
     rich = 1
@@ -97,10 +151,51 @@ def get_downloader(api: FAAPI, folder: str) -> _FolderDownloader:
         return api.scraps
     elif folder == Folder.favorites:
         return api.favorites
+    elif folder == Folder.journals:
+        return api.journals
+    elif folder == Folder.watchlist_by:
+        return api.watchlist_by
+    elif folder == Folder.watchlist_to:
+        return api.watchlist_to
     else:
         raise KeyError(f"Unknown folder {folder}")
 
 
+def resize_pool(api: FAAPI, size: int):
+    for prefix in ("https://", "http://"):
+        api.session.mount(prefix, HTTPAdapter(pool_maxsize=size))
+
+
+def lock_delay(api: FAAPI):
+    lock: Lock = Lock()
+    handle_delay: Callable[[], None] = api.handle_delay
+
+    def handle_delay_locked():
+        with lock:
+            handle_delay()
+
+    api.handle_delay = handle_delay_locked
+
+
+def thumbnail_date(url: str) -> datetime | None:
+    return datetime.fromtimestamp(int(m[1])) if (m := search(r"@\d+-(\d+)\.", url or "")) else None
+
+
+def file_thumbnail_url(submission_id: int, file_url: str, size: int = 600) -> str:
+    if not (m := search(r"/(\d+)/[^/]+$", file_url or "")):
+        return ""
+    return f"https://t.furaffinity.net/{submission_id}@{size}-{m[1]}.jpg"
+
+
+def backoff_delay(attempt: int, base: float = 1, cap: float = 30) -> float:
+    delay: float = min(cap, base * (2 ** attempt))
+    return (delay / 2) + uniform(0, delay / 2)
+
+
+def limit_delay(api: FAAPI, limiter: RateLimiter):
+    api.handle_delay = lambda: limiter.acquire(RateLimiter.pages)
+
+
 def download_catch(func: Callable[..., T], *args, **kwargs) -> tuple[T | None, int]:
     """
     0 no errors
@@ -110,6 +205,8 @@ def download_catch(func: Callable[..., T], *args, **kwargs) -> tuple[T | None, i
     2 user disabled
 
     3 server error
+
+    4 notice message (e.g. content filter, hidden or deleted entry)
     """
     try:
         return func(*args, **kwargs), 0
@@ -117,22 +214,339 @@ def download_catch(func: Callable[..., T], *args, **kwargs) -> tuple[T | None, i
         return None, 1
     except DisabledAccount:
         return None, 2
-    except (NoticeMessage, ServerError):
+    except ServerError:
         return None, 3
+    except NoticeMessage:
+        return None, 4
+
+
+def server_failure(error: RequestException) -> bool:
+    if isinstance(error, HTTPError):
+        return error.response is not None and error.response.status_code >= 500
+    return isinstance(error, (ConnectionError, Timeout))
+
+
+def get_page(api: FAAPI, path: str) -> str:
+    response: Response = api.get(path)
+    response.raise_for_status()
+    return response.text
+
+
+def detach_tags(obj: T, _seen: set[int] | None = None) -> T:
+    _seen = set() if _seen is None else _seen
+    if id(obj) in _seen or not hasattr(obj, "__dict__"):
+        return obj
+    _seen.add(id(obj))
+    for name, value in vars(obj).items():
+        if isinstance(value, bs4.Tag):
+            setattr(obj, name, None)
+        elif isinstance(value, list):
+            for item in value:
+                detach_tags(item, _seen)
+        else:
+            detach_tags(value, _seen)
+    return obj
+
+
+def parse_submission(text: str, check_auth: bool = True) -> Submission:
+    page: bs4.BeautifulSoup = parse_page(text)
+    check_page_raise(page)
+    if check_auth and not parse_loggedin_user(page):
+        raise Unauthorized("Not logged in")
+    return detach_tags(Submission(page))
+
+
+def inbox_submissions(api: FAAPI, page: str) -> tuple[list[SubmissionPartial], str | None]:
+    page_parsed: bs4.BeautifulSoup = api.get_parsed(page)
+    next_page: str | None = next((a["href"] for a in page_parsed.select("a[href*='/msg/submissions/']")
+                                  if a.text.strip().lower().startswith("next")), None)
+    return list(map(SubmissionPartial, parse_submission_figures(page_parsed))), next_page
+
+
+def inbox_journals(api: FAAPI, page: str) -> tuple[list[JournalPartial], None]:
+    journals: list[JournalPartial] = []
+    for item in api.get_parsed(page).select("#messages-journals li"):
+        if not (a_journal := item.select_one("a[href*='/journal/']")) or not (a_user := item.select_one(
+                "a[href*='/user/']")):
+            continue
+        journal: JournalPartial = JournalPartial()
+        journal.id = int(m[1]) if (m := search(r"/journal/(\d+)", a_journal["href"])) else 0
+        journal.title = a_journal.text.strip()
+        journal.author.name = m[1] if (m := search(r"/user/([^/]+)", a_user["href"])) else a_user.text.strip()
+        journals.append(journal)
+    return [j for j in journals if j.id], None
+
+
+def part_file(folder: Path, name: str, url: str) -> Path:
+    return folder / f".{name}.{sha1(url.encode()).hexdigest()[:16]}.part"
+
+
+def clean_part_files(part: Path):
+    for stale in part.parent.glob(f".{part.name.split('.')[1]}.*.part"):
+        stale.unlink(missing_ok=True) if stale != part else None
+
+
+def content_range(header: str) -> tuple[int, int, int]:
+    if m := match(r"^bytes\s+(?:(\d+)-(\d+)|\*)/(\d+|\*)$", header.strip()):
+        return int(m[1] or -1), int(m[2] or -1), int(m[3]) if m[3] != "*" else 0
+    return -1, -1, -1
+
+
+def move_part_file(part: Path, dest: Path, ext: str, store: Path | None = None) -> str:
+    with part.open("rb") as f:
+        ext = guess_extension(f.read(8192), ext)
+    replace_file(part, dest.with_name(dest.name + f".{ext}" * bool(ext)), store)
+    return ext
+
+
+def replace_file(part: Path, dest: Path, store: Path | None = None):
+    if store:
+        release_file(store, dest)
+    part.replace(dest)
+    if store:
+        store_file(store, dest)
+
+
+def file_store(db: Database) -> Path:
+    return db.settings.files_folder / ".store"
+
+
+def stored_path(store: Path, file: Path) -> Path:
+    digest = sha256()
+    with file.open("rb") as f:
+        while chunk := f.read(chunk_size):
+            digest.update(chunk)
+    return store / (h := digest.hexdigest())[:2] / h
+
+
+def store_file(store: Path, file: Path) -> Path | None:
+    try:
+        stored: Path = stored_path(store, file)
+        if not stored.is_file():
+            stored.parent.mkdir(parents=True, exist_ok=True)
+            link(file, stored)
+        elif not stored.samefile(file):
+            (tmp := file.with_name(f".{file.name}.link")).unlink(missing_ok=True)
+            link(stored, tmp)
+            tmp.replace(file)
+    except OSError:
+        return None
+    return stored
+
+
+def release_file(store: Path, file: Path):
+    """
+    Remove a submission file before it is replaced or deleted, so that files linked to it are not changed. The store
+    entry is removed as well if no other file links to it.
+    """
+    try:
+        if file.is_file() and file.stat().st_nlink == 2 and (stored := stored_path(store, file)).is_file() and \
+                stored.samefile(file):
+            stored.unlink()
+        file.unlink(missing_ok=True)
+    except OSError:
+        pass
 
 
 def save_comments(db: Database, parent_table: str, parent_id: int, comments: list[Comment],
                   *, replace: bool = False, bbcode: bool = False):
-    for comment in filter(lambda c: not c.hidden, flatten_comments(comments)):
-        db.comments.save_comment(
+    entries: list[dict[str, Any]] = [
+        db.comments.format_entry(
             {CommentsColumns.ID.name: comment.id,
              CommentsColumns.PARENT_TABLE.name: parent_table,
              CommentsColumns.PARENT_ID.name: parent_id,
              CommentsColumns.REPLY_TO.name: comment.reply_to.id if comment.reply_to else None,
              CommentsColumns.AUTHOR.name: comment.author.name,
              CommentsColumns.DATE.name: comment.date,
-             CommentsColumns.TEXT.name: comment.text_bbcode if bbcode else comment.text},
-            replace=replace, exist_ok=True)
+             CommentsColumns.TEXT.name: comment.text_bbcode if bbcode else comment.text})
+        for comment in filter(lambda c: not c.hidden, flatten_comments(comments))]
+    if not entries:
+        return
+    saved: dict[int, tuple] = {c[CommentsColumns.ID.name]: tuple(db.comments.format_entry(c).values())
+                               for c in db.comments.get_comments(parent_table, parent_id)}
+    entries = [e for e in entries if (s := saved.get(e[CommentsColumns.ID.name])) is None or
+               (replace and s != tuple(e.values()))]
+    if not entries:
+        return
+    db.connection.executemany(
+        f"INSERT OR {'REPLACE' if replace else 'IGNORE'} INTO {db.comments.name}"
+        f" ({','.join(entries[0].keys())}) VALUES ({','.join(['?'] * len(entries[0]))})",
+        [tuple(e.values()) for e in entries])
+
+
+class CircuitBreaker:
+    def __init__(self, probe: Callable[[], bool], threshold: int = 5, pause: float = 60, max_pause: float = 900,
+                 on_pause: Callable[[], Any] = lambda: None):
+        self.probe: Callable[[], bool] = probe
+        self.threshold: int = threshold
+        self.pause: float = pause
+        self.max_pause: float = max_pause
+        self.on_pause: Callable[[], Any] = on_pause
+        self.failures: int = 0
+        self._failures_lock: Lock = Lock()
+        self._open: Lock = Lock()
+
+    def wait(self):
+        with self._open:
+            pass
+
+    def record(self, err: int) -> bool:
+        with self._failures_lock:
+            self.failures = self.failures + 1 if err == 3 else 0
+            if self.failures < self.threshold:
+                return False
+        if not self._open.acquire(blocking=False):
+            self.wait()
+            return True
+        try:
+            self.on_pause()
+            pause: float = self.pause
+            sleep(pause)
+            while not self.probe():
+                pause = min(pause * 2, self.max_pause)
+                sleep(pause)
+            with self._failures_lock:
+                self.failures = 0
+        finally:
+            self._open.release()
+        return True
+
+
+class FolderStateColumns(Columns):
+    USERNAME: Column = Column("USERNAME", str, key=True, to_entry=clean_username)
+    FOLDER: Column = Column("FOLDER", str, key=True)
+    MARK: Column = Column("MARK", int, default=0)
+    COUNT: Column = Column("COUNT", int, default=-1)
+    CHECKS: Column = Column("CHECKS", int, default=0)
+    HITS: Column = Column("HITS", int, default=0)
+    CHECKED: Column = Column("CHECKED", datetime)
+    UPDATED: Column = Column("UPDATED", datetime, not_null=False)
+
+
+class FolderStateTable(Table):
+    def get_state(self, user: str, folder: str) -> dict[str, Any] | None:
+        return self.select(Sb() & [Sb(FolderStateColumns.USERNAME.name) == clean_username(user),
+                                   Sb(FolderStateColumns.FOLDER.name) == folder]).fetchone()
+
+    def set_state(self, user: str, folder: str, *, mark: int | None = None, count: int | None = None,
+                  hit: bool | None = None, updated: datetime | None = None):
+        state: dict[str, Any] = self.get_state(user, folder) or {}
+        self.insert(self.format_entry({**state,
+                                       FolderStateColumns.USERNAME.name: user,
+                                       FolderStateColumns.FOLDER.name: folder,
+                                       **({FolderStateColumns.MARK.name: mark} if mark is not None else {}),
+                                       **({FolderStateColumns.COUNT.name: count} if count is not None else {}),
+                                       **({FolderStateColumns.CHECKS.name: state.get(FolderStateColumns.CHECKS.name,
+                                                                                      0) + 1,
+                                           FolderStateColumns.HITS.name: state.get(FolderStateColumns.HITS.name,
+                                                                                    0) + hit}
+                                          if hit is not None else {}),
+                                       **({FolderStateColumns.UPDATED.name: updated} if updated is not None else {}),
+                                       FolderStateColumns.CHECKED.name: datetime.now()}),
+                    replace=True)
+
+
+class CheckpointColumns(Columns):
+    TYPE: Column = Column("TYPE", str, key=True)
+    VALUE: Column = Column("VALUE", str, key=True)
+
+
+class CheckpointTable(Table):
+    finished: str = "finished"
+    added: str = "added"
+
+    def get_values(self, type_: str) -> list[int | str]:
+        return [loads(v) for [v] in self.select(Sb(CheckpointColumns.TYPE.name) == type_,
+                                                columns=[CheckpointColumns.VALUE]).tuples]
+
+    def add_value(self, type_: str, value: int | str):
+        self.insert(self.format_entry({CheckpointColumns.TYPE.name: type_, CheckpointColumns.VALUE.name: dumps(value)}),
+                    exists_ok=True)
+
+    def clear(self, type_: str):
+        self.delete(Sb(CheckpointColumns.TYPE.name) == type_)
+
+
+class NegativeCacheColumns(Columns):
+    TABLE: Column = Column("TABLENAME", str, key=True)
+    ID: Column = Column("ID", int, key=True)
+    ERROR: Column = Column("ERROR", int)
+    ADDED: Column = Column("ADDED", datetime)
+
+
+class NegativeCacheTable(Table):
+    def get_error(self, table: str, id_: int, ttl: timedelta) -> int:
+        entry: dict[str, Any] | None = self.select(Sb() & [Sb(NegativeCacheColumns.TABLE.name) == table,
+                                                           Sb(NegativeCacheColumns.ID.name) == id_]).fetchone()
+        if not entry or datetime.now() - entry[NegativeCacheColumns.ADDED.name] > ttl:
+            return 0
+        return entry[NegativeCacheColumns.ERROR.name]
+
+    def set_error(self, table: str, id_: int, err: int):
+        if err:
+            self.insert(self.format_entry({NegativeCacheColumns.TABLE.name: table,
+                                           NegativeCacheColumns.ID.name: id_,
+                                           NegativeCacheColumns.ERROR.name: err,
+                                           NegativeCacheColumns.ADDED.name: datetime.now()}),
+                        replace=True)
+        else:
+            self.delete(Sb() & [Sb(NegativeCacheColumns.TABLE.name) == table, Sb(NegativeCacheColumns.ID.name) == id_])
+
+
+class FileQueueColumns(Columns):
+    ID: Column = Column("ID", int, key=True)
+    FILEURL: Column = Column("FILEURL", str)
+    THUMBNAILURL: Column = Column("THUMBNAILURL", str)
+    ADDED: Column = Column("ADDED", datetime)
+
+
+class FingerprintsColumns(Columns):
+    TABLE: Column = Column("TABLENAME", str, key=True)
+    ID: Column = Column("ID", int, key=True)
+    METADATA: Column = Column("METADATA", str, default="")
+    FILE: Column = Column("FILE", str, default="")
+
+
+class FingerprintsTable(Table):
+    def get_fingerprint(self, table: str, id_: int) -> dict[str, Any]:
+        return self.select(Sb() & [Sb(FingerprintsColumns.TABLE.name) == table,
+                                   Sb(FingerprintsColumns.ID.name) == id_]).fetchone() or {}
+
+    def set_fingerprint(self, table: str, id_: int, *, metadata: str | None = None, file: str | None = None):
+        self.insert(self.format_entry({**self.get_fingerprint(table, id_),
+                                       FingerprintsColumns.TABLE.name: table,
+                                       FingerprintsColumns.ID.name: id_,
+                                       **({FingerprintsColumns.METADATA.name: metadata}
+                                          if metadata is not None else {}),
+                                       **({FingerprintsColumns.FILE.name: file} if file is not None else {})}),
+                    replace=True)
+
+
+def fingerprint(entry: dict[str, Any]) -> str:
+    return sha1(dumps(entry, sort_keys=True, default=str).encode()).hexdigest()
+
+
+def file_validator(url: str, size: int, headers: dict[str, str]) -> str:
+    return f"{url}|{size}|{headers.get('ETag') or headers.get('Last-Modified') or ''}"
+
+
+def negative_cache_ttl(db: Database) -> float:
+    return float(ttl) if (ttl := db.settings[negative_cache_ttl_setting]) else negative_cache_ttl_default
+
+
+class IDIndex:
+    def __init__(self, ids: Iterable[int] = (), size: int = 0):
+        self.bits: bytearray = bytearray((size >> 3) + 1)
+        for id_ in ids:
+            self.add(id_)
+
+    def __contains__(self, id_: int) -> bool:
+        return (i := id_ >> 3) < len(self.bits) and bool(self.bits[i] & (1 << (id_ & 7)))
+
+    def add(self, id_: int):
+        if (i := id_ >> 3) >= len(self.bits):
+            self.bits.extend(bytes(i - len(self.bits) + 1))
+        self.bits[i] |= 1 << (id_ & 7)
 
 
 class Bar:
@@ -178,9 +592,12 @@ class Bar:
 # noinspection DuplicatedCode
 class Downloader:
     def __init__(self, db: Database, api: FAAPI, *, color: bool = True, retry: int = 0, comments: bool = False,
-                 content_only: bool = False, replace: bool = False, dry_run: bool = False):
+                 content_only: bool = False, replace: bool = False, dry_run: bool = False, workers: int = 1,
+                 limiter: RateLimiter | None = None, max_duration: int | None = None,
+                 max_requests: int | None = None, defer_files: bool = False, parsers: int = 0):
         self.db: Database = db
         self.bbcode: bool = self.db.settings.bbcode
+        self.file_store: bool = self.db.settings[file_store_setting] == "true"
         self.output: OutputType = OutputType.rich if terminal_width() > 0 else OutputType.simple
         self.color: bool = color
         self.retry: int = retry
@@ -188,9 +605,55 @@ class Downloader:
         self.content_only: bool = content_only
         self.replace: bool = replace
         self.dry_run: bool = dry_run
+        self.defer_files: bool = defer_files
         self.api: FAAPI = api
         self.bar_width: int = 10
         self._bar: Bar | None = None
+        self.workers: int = workers
+        self._pool: ThreadPoolExecutor | None = ThreadPoolExecutor(workers) if workers > 1 else None
+        self._files_queue: list[tuple[int, Future[Path | None] | None, Future[Path | None] | None,
+                                      Callable[[Path | None, Path | None], Any]]] = []
+        self._queued_submissions: set[int] = set()
+        self._parse_errors: list[int] = []
+        self._parse_pool: ProcessPoolExecutor | None = \
+            ProcessPoolExecutor(parsers, mp_context=get_context("spawn")) if parsers and workers > 1 else None
+        self.deadline: float | None = monotonic() + max_duration if max_duration else None
+        self.max_requests: int | None = max_requests
+        self.requests: int = 0
+        self._requests_lock: Lock = Lock()
+        self._checkpoint: dict[str, Any] = {}
+        self._checkpoint_enabled: bool = True
+        self._resume_page: tuple[str, str, int | str | None] | None = None
+        self._resume_added: list[int | str] = []
+        # Other processes can only write to the database between commits
+        self.commit_entries: int = 1 if EnvVars.MULTI_CONNECTION else 50
+        self.commit_interval: float = 0 if EnvVars.MULTI_CONNECTION else 30
+        self._uncommitted: int = 0
+        self._last_commit: float = monotonic()
+        self.folder_state: FolderStateTable = FolderStateTable(db, folder_state_table,
+                                                               FolderStateColumns.as_list())
+        self.checkpoint_entries: CheckpointTable = CheckpointTable(db, checkpoint_table, CheckpointColumns.as_list())
+        self.negative_cache: NegativeCacheTable = NegativeCacheTable(db, negative_cache_table,
+                                                                     NegativeCacheColumns.as_list())
+        self.negative_cache_ttl: float = negative_cache_ttl(db)
+        self.file_queue: Table = Table(db, file_queue_table, FileQueueColumns.as_list())
+        self.fingerprints: FingerprintsTable = FingerprintsTable(db, fingerprints_table,
+                                                                 FingerprintsColumns.as_list())
+        self._validators: dict[str, str] = {}
+        self._submissions_index: IDIndex | None = None
+        self._journals_index: IDIndex | None = None
+        self._data_version: int | None = None
+        self._listings_pool: ThreadPoolExecutor | None = ThreadPoolExecutor(workers) if workers > 1 else None
+        self._listings: dict[tuple[str, str, int | str], Future[tuple[Any, int]]] = {}
+        self.breaker: CircuitBreaker = CircuitBreaker(self.probe_server, on_pause=self.bar_pause)
+
+        self.limiter: RateLimiter | None = limiter
+
+        if limiter is not None:
+            limit_delay(self.api, limiter)
+        if workers > 1:
+            lock_delay(self.api)
+            resize_pool(self.api, (workers * 2) + 1)
 
         self.added_users: list[int | str] = []
         self.added_userpages: list[int | str] = []
@@ -205,8 +668,13 @@ class Downloader:
         self.submission_errors: list[int] = []
         self.file_errors: list[int] = []
         self.thumbnail_errors: list[int] = []
+        self.deferred_files: list[int] = []
         self.journal_errors: list[int] = []
 
+    def added_count(self) -> int:
+        return sum(map(len, (self.added_users, self.added_userpages, self.added_submissions, self.added_journals,
+                             self.modified_userpages, self.modified_submissions, self.modified_journals)))
+
     def report(self) -> str:
         items: list[tuple[str, int]] = [
             ("Added users", len(set(self.added_users))),
@@ -220,6 +688,7 @@ class Downloader:
             ("Submission errors", len(set(self.submission_errors))),
             ("File errors", len(set(self.file_errors))),
             ("Thumbnail errors", len(set(self.thumbnail_errors))),
+            ("Deferred files", len(set(self.deferred_files))),
             ("Added journals", len(set(self.added_journals))),
             ("Modified journals", len(set(self.modified_journals))),
             ("Journal Errors", len(set(self.journal_errors))),
@@ -247,6 +716,7 @@ class Downloader:
                     "errors": sort_set(self.submission_errors),
                     "file_errors": sort_set(self.file_errors),
                     "thumbnail_errors": sort_set(self.thumbnail_errors),
+                    "deferred_files": sort_set(self.deferred_files),
                 },
                 "journals": {
                     "added": sort_set(self.added_journals),
@@ -266,6 +736,7 @@ class Downloader:
                 ("Submission errors", sort_set(self.submission_errors)),
                 ("File errors", sort_set(self.file_errors)),
                 ("Thumbnail errors", sort_set(self.thumbnail_errors)),
+                ("Deferred files", sort_set(self.deferred_files)),
                 ("Added journal", sort_set(self.added_journals)),
                 ("Modified journal", sort_set(self.modified_journals)),
                 ("Journal Errors", sort_set(self.journal_errors)),
@@ -315,27 +786,385 @@ class Downloader:
             return
         self._bar.delete()
 
-    def download_bytes(self, url: str) -> bytes | None:
+    @property
+    def submissions_index(self) -> IDIndex:
+        if self._submissions_index is None:
+            self._submissions_index = IDIndex(
+                (i for [i] in self.db.submissions.select(columns=[SubmissionsColumns.ID]).tuples),
+                next(self.db.submissions.select(columns=[Column(f"max({SubmissionsColumns.ID.name})", int)]).tuples,
+                     [0])[0] or 0)
+        return self._submissions_index
+
+    @property
+    def journals_index(self) -> IDIndex:
+        if self._journals_index is None:
+            self._journals_index = IDIndex(
+                (i for [i] in self.db.journals.select(columns=[JournalsColumns.ID]).tuples),
+                next(self.db.journals.select(columns=[Column(f"max({JournalsColumns.ID.name})", int)]).tuples,
+                     [0])[0] or 0)
+        return self._journals_index
+
+    def refresh_indexes(self):
+        if (version := self.db.connection.execute("pragma data_version").fetchone()[0]) != self._data_version:
+            self._submissions_index = self._journals_index = None
+            self._data_version = version
+
+    def submission_entry(self, submission_id: int) -> dict[str, Any] | None:
+        if submission_id not in self.submissions_index:
+            return None
+        elif self.replace:
+            return self.db.submissions[submission_id]
+        return self.db.submissions.select(
+            Sb(SubmissionsColumns.ID.name) == submission_id,
+            columns=[SubmissionsColumns.ID, SubmissionsColumns.FOLDER, SubmissionsColumns.FAVORITE,
+                     SubmissionsColumns.USERUPDATE]).fetchone()
+
+    def journal_entry(self, journal_id: int) -> dict[str, Any] | None:
+        if journal_id not in self.journals_index:
+            return None
+        elif self.replace:
+            return self.db.journals[journal_id]
+        return self.db.journals.select(Sb(JournalsColumns.ID.name) == journal_id,
+                                       columns=[JournalsColumns.ID, JournalsColumns.USERUPDATE]).fetchone()
+
+    def update_submission(self, entry: dict[str, Any], *, user_update: bool | None = None, folder: str | None = None,
+                          favorite: str | None = None) -> bool:
+        changes: dict[str, Any] = {}
+        if user_update is not None and entry[SubmissionsColumns.USERUPDATE.name] != user_update:
+            changes[SubmissionsColumns.USERUPDATE.name] = user_update
+        if folder is not None and entry[SubmissionsColumns.FOLDER.name] != folder:
+            changes[SubmissionsColumns.FOLDER.name] = folder
+        if favorite is not None and (favorite := clean_username(favorite)) not in \
+                entry[SubmissionsColumns.FAVORITE.name]:
+            changes[SubmissionsColumns.FAVORITE.name] = {*entry[SubmissionsColumns.FAVORITE.name], favorite}
+        if changes:
+            self.db.submissions.update(Sb(SubmissionsColumns.ID.name) == entry[SubmissionsColumns.ID.name],
+                                       self.db.submissions.format_entry(changes, defaults=False))
+        return bool(changes)
+
+    def update_journal(self, entry: dict[str, Any], *, user_update: bool) -> bool:
+        if entry[JournalsColumns.USERUPDATE.name] == user_update:
+            return False
+        self.db.journals.update(Sb(JournalsColumns.ID.name) == entry[JournalsColumns.ID.name],
+                                self.db.journals.format_entry({JournalsColumns.USERUPDATE.name: user_update},
+                                                              defaults=False))
+        return True
+
+    def index_submission(self, submission_id: int):
+        if self._submissions_index is not None:
+            self._submissions_index.add(submission_id)
+
+    def index_journal(self, journal_id: int):
+        if self._journals_index is not None:
+            self._journals_index.add(journal_id)
+
+    def commit(self, *, force: bool = False):
+        self._uncommitted += not force
+        if force or self._uncommitted >= self.commit_entries or \
+                monotonic() - self._last_commit >= self.commit_interval:
+            self.db.commit()
+            self._uncommitted, self._last_commit = 0, monotonic()
+
+    def probe_server(self) -> bool:
         try:
-            stream: Response = self.api.session.get(url, stream=True)
-            stream.raise_for_status()
-            size: int = int(stream.headers.get("Content-Length", 0))
-            on_chunk = self.bar_update if size else lambda *_: None
-            file: bytes = bytes()
-            for chunk in stream.iter_content(chunk_size=int(1e3)):
-                file += chunk
-                on_chunk(size, len(file))
-            return file
+            return not download_catch(self.api.get_parsed, "/", skip_auth_check=True)[1]
+        except RequestException:
+            return False
+
+    def bar_pause(self):
+        if current_thread() is main_thread():
+            self.bar_message("PAUSED", red)
+
+    def count_request(self):
+        with self._requests_lock:
+            self.requests += 1
+
+    def check_budget(self):
+        if (self.deadline is not None and monotonic() >= self.deadline) or \
+                (self.max_requests is not None and self.requests >= self.max_requests):
+            self.save_queued_files(wait=True)
+            self.commit(force=True)
+            raise BudgetExhausted()
+
+    def download_catch(self, func: Callable[..., T], *args, **kwargs) -> tuple[T | None, int]:
+        paused: bool = False
+        while True:
+            self.breaker.wait()
+            self.count_request()
+            try:
+                result, err = download_catch(func, *args, **kwargs)
+            except RequestException as error:
+                if paused or not server_failure(error):
+                    raise
+                paused = self.breaker.record(3) or paused
+                continue
+            if not self.breaker.record(err):
+                return result, err
+
+    def get_state(self, user: str, folder: str) -> dict[str, Any]:
+        if self.folder_state not in self.db:
+            return {}
+        return self.folder_state.get_state(user, folder) or {}
+
+    def set_state(self, user: str, folder: str, *, mark: int | None = None, count: int | None = None,
+                  hit: bool | None = None, updated: datetime | None = None):
+        self.folder_state.create()
+        self.folder_state.set_state(user, folder, mark=mark, count=count, hit=hit, updated=updated)
+
+    def cached_error(self, table: str, id_: int) -> int:
+        if not self.negative_cache_ttl or self.negative_cache not in self.db:
+            return 0
+        return self.negative_cache.get_error(table, id_, timedelta(days=self.negative_cache_ttl))
+
+    def cache_error(self, table: str, id_: int, err: int):
+        if self.dry_run or not self.negative_cache_ttl or err not in (0, 1, 2):
+            return
+        elif err:
+            self.negative_cache.create()
+        elif self.negative_cache not in self.db:
+            return
+        self.negative_cache.set_error(table, id_, err)
+        self.commit()
+
+    def download_catch_cached(self, table: str, id_: int, func: Callable[..., T], *args, **kwargs
+                              ) -> tuple[T | None, int]:
+        if err := self.cached_error(table, id_):
+            return None, err
+        result, err = self.download_catch(func, *args, **kwargs)
+        self.cache_error(table, id_, err)
+        return result, err
+
+    def get_fingerprint(self, table: str, id_: int) -> dict[str, Any]:
+        if self.fingerprints not in self.db:
+            return {}
+        return self.fingerprints.get_fingerprint(table, id_)
+
+    def set_fingerprint(self, table: str, id_: int, *, metadata: str | None = None, file: str | None = None):
+        self.fingerprints.create()
+        self.fingerprints.set_fingerprint(table, id_, metadata=metadata, file=file)
+
+    def upload_rates(self, days: int = 365) -> dict[str, dict[str, float]]:
+        since: str = (datetime.now() - timedelta(days=days)).strftime("%Y-%m-%dT%H:%M")
+        rates: dict[str, dict[str, float]] = {Folder.gallery: {}, Folder.journals: {}}
+        for folder, table in ((Folder.gallery, submissions_table), (Folder.journals, journals_table)):
+            for author, count in self.db.execute(f"select AUTHOR, count(*) from {table} where DATE >= ?"
+                                                 f" group by AUTHOR", [since]):
+                user: str = clean_username(author)
+                rates[folder][user] = rates[folder].get(user, 0) + (count / days)
+        rates[Folder.scraps] = rates[Folder.gallery]
+        return rates
+
+    def expected_yield(self, user: str, folder: str, rates: dict[str, dict[str, float]]) -> float:
+        state: dict[str, Any] = self.get_state(user, folder.split(":")[0])
+        if not (checked := state.get(FolderStateColumns.CHECKED.name)):
+            return float("inf")
+        days: float = (datetime.now() - checked).total_seconds() / 86400
+        hit_ratio: float = (state[FolderStateColumns.HITS.name] + 1) / (state[FolderStateColumns.CHECKS.name] + 2)
+        return days * max(rates.get(folder, {}).get(user, 0), hit_ratio / 30)
+
+    def prioritise_users(self, users_folders: list[tuple[str, list[str]]], min_yield: float = 0
+                         ) -> list[tuple[str, list[str]]]:
+        rates: dict[str, dict[str, float]] = self.upload_rates()
+        scored: list[tuple[float, str, list[str]]] = []
+        for user, folders in users_folders:
+            yields: dict[str, float] = {f: self.expected_yield(user, f, rates) for f in folders}
+            if (total := sum(yields.values())) >= min_yield:
+                scored.append((total, user, sorted(folders, key=lambda f: -yields[f])))
+            else:
+                echo(f"Low yield: {yellow}{user}{reset} ({total:.2f})", color=self.color)
+        return [(u, fs) for _, u, fs in sorted(scored, key=lambda s: -s[0])]
+
+    def load_checkpoint(self, operation: str) -> dict[str, Any]:
+        checkpoint: dict[str, Any] = loads(c) if (c := self.db.settings[checkpoint_setting]) else {}
+        if checkpoint.get("operation") != operation:
+            return {}
+        elif self.checkpoint_entries in self.db:
+            checkpoint[CheckpointTable.finished] = self.checkpoint_entries.get_values(CheckpointTable.finished)
+            checkpoint[CheckpointTable.added] = self.checkpoint_entries.get_values(CheckpointTable.added)
+        return checkpoint
+
+    def save_checkpoint(self, **kwargs):
+        if self.dry_run or not self._checkpoint_enabled:
+            return
+        self._checkpoint |= kwargs
+        self.db.settings[checkpoint_setting] = dumps(self._checkpoint, separators=(",", ":"))
+
+    def add_checkpoint_entry(self, type_: str, value: int | str):
+        if self.dry_run or not self._checkpoint_enabled:
+            return
+        self.checkpoint_entries.create()
+        self.checkpoint_entries.add_value(type_, value)
+
+    def clear_checkpoint_entries(self, type_: str):
+        if self.dry_run or not self._checkpoint_enabled or self.checkpoint_entries not in self.db:
+            return
+        self.checkpoint_entries.clear(type_)
+
+    def clear_checkpoint(self):
+        if self.dry_run or not self._checkpoint_enabled:
+            return
+        self._checkpoint = {}
+        del self.db.settings[checkpoint_setting]
+        self.clear_checkpoint_entries(CheckpointTable.finished)
+        self.clear_checkpoint_entries(CheckpointTable.added)
+
+    def close(self):
+        self.commit(force=True)
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+        if self._listings_pool is not None:
+            self._listings_pool.shutdown(wait=False, cancel_futures=True)
+        if self._parse_pool is not None:
+            self._parse_pool.shutdown(wait=False, cancel_futures=True)
+
+    def prefetch_listing(self, user: str, folder: str, page: int | str, downloader: Callable[..., Any] = None):
+        if self._listings_pool is None or (key := (user, folder, page)) in self._listings:
+            return
+        elif folder == Folder.userpage:
+            self._listings[key] = self._listings_pool.submit(self.download_catch, self.api.user, user)
+        else:
+            self._listings[key] = self._listings_pool.submit(self.download_catch,
+                                                             downloader or get_downloader(self.api, folder),
+                                                             user, page)
+
+    def prefetch_users(self, users_folders: Iterable[tuple[str, list[str]]]):
+        for user, folders in users_folders:
+            for folder in map(lambda f: f.split(":")[0], folders):
+                if folder == Folder.userpage and self.dry_run:
+                    continue
+                self.prefetch_listing(user, folder, "/" if folder == Folder.favorites else 1)
+
+    def probe_user(self, user: str, folders: list[str]) -> tuple[list[str], dict[str, int]]:
+        result, err = self.download_listing(user, Folder.userpage, 1, self.api.user)
+        if Folder.userpage in folders:
+            (future := Future()).set_result((result, err))
+            self._listings[(user, Folder.userpage, 1)] = future
+        if err:
+            return folders, {}
+        counts: dict[str, int] = {Folder.gallery: result.stats.submissions,
+                                  Folder.scraps: result.stats.submissions,
+                                  Folder.favorites: result.stats.favorites,
+                                  Folder.journals: result.stats.journals}
+        unchanged: list[str] = [f for f in folders if f in counts and
+                                self.get_state(user, f).get(FolderStateColumns.COUNT.name, -1) == counts[f]]
+        for folder in unchanged:
+            echo(f"Unchanged: {yellow}{user}{reset}/{yellow}{folder}{reset}", color=self.color)
+        return [f for f in folders if f not in unchanged], counts
+
+    def download_listing(self, user: str, folder: str, page: int | str, downloader: Callable[..., T]
+                         ) -> tuple[T | None, int]:
+        if (future := self._listings.pop((user, folder, page), None)) is not None:
+            return future.result()
+        return self.download_catch(downloader, user, *([page] if folder != Folder.userpage else []))
+
+    def drop_listings(self, user: str, folder: str | None = None):
+        for key in [k for k in self._listings if k[0] == user and (folder is None or k[1] == folder)]:
+            self._listings.pop(key).cancel()
+
+    def download_bytes(self, url: str, file: Path, *, bar: bool = True) -> Path | None:
+        offset: int = file.stat().st_size if file.is_file() else 0
+        try:
+            if self.limiter is not None:
+                self.limiter.acquire(RateLimiter.files)
+            self.count_request()
+            with self.api.session.get(url, stream=True,
+                                      headers={"Range": f"bytes={offset}-"} if offset else None) as stream:
+                if stream.status_code == 416 and offset:
+                    if content_range(stream.headers.get("Content-Range", ""))[2] == offset:
+                        return file
+                    file.unlink(missing_ok=True)
+                    return self.download_bytes(url, file, bar=bar)
+                stream.raise_for_status()
+                # Content-Length and Content-Range count the encoded bytes, not the decoded ones written to the file
+                encoded: bool = stream.headers.get("Content-Encoding", "identity").strip().lower() != "identity"
+                if encoded and offset:
+                    file.unlink(missing_ok=True)
+                    return self.download_bytes(url, file, bar=bar)
+                size: int = int(stream.headers.get("Content-Length", 0)) if not encoded else 0
+                if stream.status_code != 206:
+                    offset = 0
+                elif (cr := content_range(stream.headers.get("Content-Range", "")))[0] == offset:
+                    size = cr[2]
+                else:
+                    file.unlink(missing_ok=True)
+                    return None
+                on_chunk = self.bar_update if size and bar else lambda *_: None
+                file.parent.mkdir(parents=True, exist_ok=True)
+                with file.open("ab" if offset else "wb") as f:
+                    for chunk in stream.iter_content(chunk_size=chunk_size):
+                        f.write(chunk)
+                        on_chunk(size, f.tell())
+                    length: int = f.tell()
+                if length and (not size or length == size):
+                    clean_part_files(file)
+                    self._validators[url] = file_validator(
+                        url, int(stream.headers.get("Content-Length", 0)) if encoded else size or length,
+                        stream.headers)
+                    return file
+                elif length < size:
+                    return None
         except RequestException:
             return None
+        file.unlink(missing_ok=True)
+        return None
+
+    def head_validator(self, url: str) -> str:
+        try:
+            if self.limiter is not None:
+                self.limiter.acquire(RateLimiter.files)
+            self.count_request()
+            res: Response = self.api.session.head(url, allow_redirects=True)
+            res.raise_for_status()
+            return file_validator(url, int(res.headers.get("Content-Length", 0)), res.headers)
+        except RequestException:
+            return ""
+
+    def download_file(self, url: str, file: Path, *, bar: bool = True) -> Path | None:
+        result: Path | None = self.download_bytes(url, file, bar=bar)
+        retry: int = self.retry + 1
+        while result is None and (retry := retry - 1):
+            if bar:
+                self.bar_message(f"RETRY {self.retry - retry + 1}", red)
+            sleep(backoff_delay(self.retry - retry))
+            self.api.handle_delay()
+            result = self.download_bytes(url, file, bar=bar)
+        return result
+
+    def queue_files(self, submission_id: int, file_url: str, thumbnail_url: str,
+                    save: Callable[[Path | None, Path | None], Any]):
+        folder: Path = self.db.submissions.files_folder / tiered_path(submission_id)
+        self._queued_submissions.add(submission_id)
+        self._files_queue.append((
+            submission_id,
+            self._pool.submit(self.download_file, file_url, part_file(folder, "submission", file_url), bar=False)
+            if file_url else None,
+            self._pool.submit(self.download_file, thumbnail_url, part_file(folder, "thumbnail", thumbnail_url),
+                              bar=False)
+            if thumbnail_url else None,
+            save
+        ))
+
+    def save_queued_files(self, *, wait: bool = False):
+        while self._files_queue:
+            if wait or len(self._files_queue) > self.workers * 2:
+                submission_id, file, thumb, save = self._files_queue.pop(0)
+            elif queued := next((q for q in self._files_queue
+                                 if (q[1] is None or q[1].done()) and (q[2] is None or q[2].done())), None):
+                submission_id, file, thumb, save = queued
+                self._files_queue.remove(queued)
+            else:
+                break
+            self._queued_submissions.discard(submission_id)
+            save(file.result() if file else None, thumb.result() if thumb else None)
+            if (file and not file.result()) or (thumb and not thumb.result()):
+                echo(f"{blue}{submission_id:010}{reset}" +
+                     (f" {red}FILE ERROR{reset}" if file and not file.result() else "") +
+                     (f" {red}THUMBNAIL ERROR{reset}" if thumb and not thumb.result() else ""),
+                     color=self.color)
 
     def err_to_bar(self, err: int, *, close: bool = True, close_end: str = "\n") -> int:
-        if err == 1:
-            self.bar_message("NOT FOUND", red)
-        elif err == 2:
-            self.bar_message("NOT ACTIVE", red)
-        elif err == 3:
-            self.bar_message("SERVER ERR", red)
+        if err in error_messages:
+            self.bar_message(error_messages[err], red)
         if err and close:
             self.bar_close(close_end)
         return err
@@ -343,77 +1172,297 @@ class Downloader:
     def download_journal(self, journal_id: int, user_update: bool, replace: bool = False) -> int:
         self.bar_clear()
         self.bar_message("DOWNLOAD")
-        result, err = download_catch(self.api.journal, journal_id)
+        result, err = self.download_catch_cached(journals_table, journal_id, self.api.journal, journal_id)
         if self.err_to_bar(err):
             self.journal_errors += [journal_id]
             return err
         journal: Journal = result
-        self.db.journals.save_journal({
+        changed: bool = self.save_journal(journal, user_update, replace)
+        self.bar_message("ADDED" if changed else "UNCHANGED", green, always=True)
+        return 0
+
+    def save_journal(self, journal: Journal, user_update: bool, replace: bool = False) -> bool:
+        metadata: dict[str, Any] = {
             **format_entry(dict(journal), self.db.journals.columns),
             JournalsColumns.AUTHOR.name: journal.author.name,
-            JournalsColumns.USERUPDATE.name: user_update,
             JournalsColumns.CONTENT.name: journal.content_bbcode if self.bbcode else journal.content,
             JournalsColumns.HEADER.name: (journal.header_bbcode if self.bbcode else journal.header)
             if not self.content_only else "",
             JournalsColumns.FOOTER.name: (journal.footer_bbcode if self.bbcode else journal.footer)
             if not self.content_only else "",
-        }, replace=replace)
+        }
+        metadata_fingerprint: str = fingerprint(self.db.journals.format_entry(metadata, defaults=False))
+        changed: bool = True
+        if replace and journal.id in self.journals_index and \
+                self.get_fingerprint(journals_table, journal.id).get(FingerprintsColumns.METADATA.name) == \
+                metadata_fingerprint:
+            self.db.journals.set_user_update(journal.id, user_update)
+            changed = False
+        else:
+            self.db.journals.save_journal({**metadata, JournalsColumns.USERUPDATE.name: user_update}, replace=replace)
+            self.set_fingerprint(journals_table, journal.id, metadata=metadata_fingerprint)
         if self.save_comments:
             save_comments(self.db, journals_table, journal.id, journal.comments, replace=replace, bbcode=self.bbcode)
-        self.db.commit()
-        self.bar_message("ADDED", green, always=True)
-        return 0
+        self.commit()
+        self.index_journal(journal.id)
+        return changed
+
+    def save_files(self, submission_id: int, file_url: str, file: Path | None, thumb: Path | None) -> str:
+        folder: Path = self.db.submissions.files_folder / tiered_path(submission_id)
+        store: Path | None = file_store(self.db) if self.file_store else None
+        file_ext: str = ""
+        if file:
+            file_ext = move_part_file(file, folder / "submission",
+                                      m[1] if (m := search(r"/[^/]+\.([^.]+)$", file_url)) else "", store)
+        if thumb:
+            replace_file(thumb, folder / "thumbnail.jpg", store)
+        return file_ext
+
+    def submission_metadata(self, submission: Submission) -> dict[str, Any]:
+        entry: dict[str, Any] = format_entry(dict(submission), self.db.submissions.columns)
+        for column in (SubmissionsColumns.FILEEXT, SubmissionsColumns.FILESAVED, SubmissionsColumns.FAVORITE,
+                       SubmissionsColumns.USERUPDATE):
+            entry.pop(column.name, None)
+        return {
+            **entry,
+            SubmissionsColumns.GENDER.name: submission.gender or "",
+            SubmissionsColumns.FILEURL.name: [submission.file_url],
+            SubmissionsColumns.AUTHOR.name: submission.author.name,
+            SubmissionsColumns.DESCRIPTION.name: submission.description_bbcode if self.bbcode
+            else submission.description,
+            SubmissionsColumns.FOOTER.name: (submission.footer_bbcode if self.bbcode else submission.footer)
+            if not self.content_only else "",
+        }
+
+    def save_submission(self, submission: Submission, user_update: bool, favorites: Iterable[str] | None,
+                        file: Path | None, thumb: Path | None, replace: bool = False, *, deferred: bool = False):
+        file_ext: str = self.save_files(submission.id, submission.file_url, file, thumb)
+        metadata: dict[str, Any] = self.submission_metadata(submission)
+        self.db.submissions.insert(self.db.submissions.format_entry({
+            **metadata,
+            SubmissionsColumns.FILEEXT.name: [file_ext] if file else [],
+            SubmissionsColumns.FILESAVED.name: (0b110 * bool(file)) + (0b001 * bool(thumb)),
+            SubmissionsColumns.FAVORITE.name: {*favorites} if favorites else {},
+            SubmissionsColumns.USERUPDATE.name: user_update,
+        }), replace=replace)
+        self.set_fingerprint(submissions_table, submission.id,
+                             metadata=fingerprint(self.db.submissions.format_entry(metadata, defaults=False)),
+                             file=self._validators.pop(submission.file_url, "") if file else "")
+        self._validators.pop(submission.thumbnail_url, None)
+        if self.save_comments:
+            save_comments(self.db, submissions_table, submission.id, submission.comments,
+                          replace=replace, bbcode=self.bbcode)
+        self.commit()
+        self.index_submission(submission.id)
+        self.added_submissions += [submission.id]
+        if deferred:
+            return
+        self.file_errors += [] if file else [submission.id]
+        self.thumbnail_errors += [] if thumb else [submission.id]
+
+    def save_unchanged_submission(self, submission: Submission, user_update: bool, favorites: Iterable[str] | None,
+                                  metadata_fingerprint: str, saved: dict[str, Any]) -> bool:
+        changed: bool = False
+        if self.get_fingerprint(submissions_table, submission.id).get(FingerprintsColumns.METADATA.name) != \
+                metadata_fingerprint:
+            self.db.submissions.insert(self.db.submissions.format_entry({
+                **self.submission_metadata(submission),
+                SubmissionsColumns.FILEEXT.name: saved[SubmissionsColumns.FILEEXT.name],
+                SubmissionsColumns.FILESAVED.name: saved[SubmissionsColumns.FILESAVED.name],
+                SubmissionsColumns.FAVORITE.name: {*favorites} if favorites else {},
+                SubmissionsColumns.USERUPDATE.name: user_update,
+            }), replace=True)
+            self.set_fingerprint(submissions_table, submission.id, metadata=metadata_fingerprint)
+            changed = True
+        elif {*saved[SubmissionsColumns.FAVORITE.name]} != {*(favorites or [])} or \
+                saved[SubmissionsColumns.USERUPDATE.name] != user_update:
+            self.db.submissions.update(Sb(SubmissionsColumns.ID.name) == submission.id,
+                                       self.db.submissions.format_entry({
+                                           SubmissionsColumns.FAVORITE.name: {*favorites} if favorites else {},
+                                           SubmissionsColumns.USERUPDATE.name: user_update,
+                                       }, defaults=False))
+        if self.save_comments:
+            save_comments(self.db, submissions_table, submission.id, submission.comments,
+                          replace=True, bbcode=self.bbcode)
+        self.commit()
+        self.modified_submissions += [submission.id] if changed else []
+        return changed
+
+    def defer_submission_files(self, submission: Submission, thumbnail: str, filesaved: int = 0):
+        self.file_queue.create()
+        self.file_queue.insert(self.file_queue.format_entry({
+            FileQueueColumns.ID.name: submission.id,
+            FileQueueColumns.FILEURL.name: submission.file_url if not filesaved & 0b010 else "",
+            FileQueueColumns.THUMBNAILURL.name:
+                (submission.thumbnail_url or thumbnail) if not filesaved & 0b001 else "",
+            FileQueueColumns.ADDED.name: datetime.now(),
+        }), replace=True)
+        self.commit()
+        self.deferred_files += [submission.id]
+
+    def save_backfill(self, submission_id: int, file_url: str, thumbnail_url: str, file: Path | None,
+                      thumb: Path | None):
+        if (entry := self.db.submissions[submission_id]) is None:
+            if self.file_queue in self.db:
+                del self.file_queue[submission_id]
+            return self.commit()
+        file_ext: str = self.save_files(submission_id, file_url, file, thumb)
+        if file:
+            self.set_fingerprint(submissions_table, submission_id, file=self._validators.pop(file_url, ""))
+        self._validators.pop(thumbnail_url, None)
+        self.db.submissions.update(
+            Sb(SubmissionsColumns.ID.name) == submission_id,
+            self.db.submissions.format_entry({
+                SubmissionsColumns.FILEEXT.name: [file_ext] if file else entry[SubmissionsColumns.FILEEXT.name],
+                SubmissionsColumns.FILESAVED.name: entry[SubmissionsColumns.FILESAVED.name] |
+                                                   (0b110 * bool(file)) | (0b001 * bool(thumb)),
+            }, defaults=False))
+        if (file or not file_url) and self.file_queue in self.db:
+            del self.file_queue[submission_id]
+        self.modified_submissions += [submission_id] if file or thumb else []
+        self.file_errors += [submission_id] if file_url and not file else []
+        self.thumbnail_errors += [submission_id] if thumbnail_url and not thumb else []
+        self.commit()
+
+    def backfill_entries(self, missing: bool = False) -> list[tuple[int, str, str]]:
+        entries: dict[int, tuple[int, str, str]] = {}
+        if missing:
+            for id_, file_urls, saved in self.db.submissions.select_sql(
+                    f"{SubmissionsColumns.FILESAVED.name} & 3 != 3",
+                    columns=[SubmissionsColumns.ID, SubmissionsColumns.FILEURL, SubmissionsColumns.FILESAVED],
+                    order=[SubmissionsColumns.ID.name]).tuples:
+                file_url: str = file_urls[0] if file_urls else ""
+                entries[id_] = (id_, file_url if not saved & 0b010 else "",
+                                file_thumbnail_url(id_, file_url) if not saved & 0b001 else "")
+        if self.file_queue in self.db:
+            for id_, file_url, thumbnail_url, _ in self.file_queue.select(order=[FileQueueColumns.ADDED.name]).tuples:
+                entries[id_] = (id_, file_url, thumbnail_url)
+        return [e for e in entries.values() if e[1] or e[2]]
 
     def download_submission(self, submission_id: int, user_update: bool, favorites: Iterable[str] | None,
                             thumbnail: str, replace: bool = False) -> int:
+        if self._parse_pool is not None and not replace and not self.defer_files:
+            return self.download_submission_parsed(submission_id, user_update, favorites, thumbnail)
         self.bar_clear()
         self.bar_message("DOWNLOAD")
-        result, err = download_catch(self.api.submission, submission_id)
+        result, err = self.download_catch_cached(submissions_table, submission_id, self.api.submission,
+                                                 submission_id)
         if self.err_to_bar(err):
             self.submission_errors += [submission_id]
             return err
         submission: Submission = result[0]
+        saved: dict[str, Any] | None = self.db.submissions[submission_id] \
+            if replace and submission_id in self.submissions_index else None
+        if saved and saved[SubmissionsColumns.FILESAVED.name] & 0b011 == 0b011 and \
+                (file_fingerprint := self.get_fingerprint(submissions_table, submission_id)
+                    .get(FingerprintsColumns.FILE.name)) and \
+                file_fingerprint == self.head_validator(submission.file_url):
+            changed: bool = self.save_unchanged_submission(submission, user_update, favorites,
+                                                           fingerprint(self.db.submissions.format_entry(
+                                                               self.submission_metadata(submission), defaults=False)),
+                                                           saved)
+            self.bar_message("UPDATED" if changed else "UNCHANGED", green, always=True)
+            self.bar_close()
+            return 0
+        elif self.defer_files and saved:
+            changed: bool = self.save_unchanged_submission(submission, user_update, favorites,
+                                                           fingerprint(self.db.submissions.format_entry(
+                                                               self.submission_metadata(submission), defaults=False)),
+                                                           saved)
+            if (filesaved := saved[SubmissionsColumns.FILESAVED.name]) & 0b011 != 0b011:
+                self.defer_submission_files(submission, thumbnail, filesaved)
+            self.bar_message("DEFERRED" if filesaved & 0b011 != 0b011 else "UPDATED" if changed else "UNCHANGED",
+                             green, always=True)
+            self.bar_close()
+            return 0
+        elif self.defer_files:
+            self.save_submission(submission, user_update, favorites, None, None, replace, deferred=True)
+            self.defer_submission_files(submission, thumbnail)
+            self.bar_message("DEFERRED", green, always=True)
+            self.bar_close()
+            return 0
+        elif self._pool is not None:
+            self.queue_files(submission_id, submission.file_url, submission.thumbnail_url or thumbnail,
+                             lambda f, t: self.save_submission(submission, user_update, favorites, f, t, replace))
+            self.bar_message("QUEUED", green, always=True)
+            self.bar_close()
+            return 0
+        folder: Path = self.db.submissions.files_folder / tiered_path(submission_id)
         self.bar_clear()
         self.bar_close("\b")
         self.bar(7)
-        file: bytes | None = self.download_bytes(submission.file_url)
-        retry: int = self.retry + 1
-        while file is None and (retry := retry - 1):
-            self.bar_message(f"RETRY {self.retry - retry + 1}", red)
-            self.api.handle_delay()
-            file = self.download_bytes(submission.file_url)
+        file: Path | None = self.download_file(submission.file_url,
+                                                 part_file(folder, "submission", submission.file_url))
         self.bar_message(("#" * self.bar_width) if file else "ERROR", green if file else red, always=True)
         self.bar_close("]")
         self.bar(1)
-        thumb: bytes | None = self.download_bytes(submission.thumbnail_url or thumbnail)
-        retry = self.retry + 1
-        while thumb is None and (retry := retry - 1):
-            self.bar_message(f"RETRY {self.retry - retry + 1}", red)
-            self.api.handle_delay()
-            thumb = self.download_bytes(submission.thumbnail_url or thumbnail)
-        self.db.submissions.save_submission({
-            **format_entry(dict(submission), self.db.submissions.columns),
-            SubmissionsColumns.GENDER.name: submission.gender or "",
-            SubmissionsColumns.FILEURL.name: [submission.file_url],
-            SubmissionsColumns.AUTHOR.name: submission.author.name,
-            SubmissionsColumns.FAVORITE.name: {*favorites} if favorites else {},
-            SubmissionsColumns.USERUPDATE.name: user_update,
-            SubmissionsColumns.DESCRIPTION.name: submission.description_bbcode if self.bbcode
-            else submission.description,
-            SubmissionsColumns.FOOTER.name: (submission.footer_bbcode if self.bbcode else submission.footer)
-            if not self.content_only else "",
-        }, [file], thumb, replace=replace)
-        if self.save_comments:
-            save_comments(self.db, submissions_table, submission.id, submission.comments,
-                          replace=replace, bbcode=self.bbcode)
-        self.db.commit()
+        thumb: Path | None = self.download_file(thumbnail_url := submission.thumbnail_url or thumbnail,
+                                                part_file(folder, "thumbnail", thumbnail_url))
+        self.save_submission(submission, user_update, favorites, file, thumb, replace)
         self.bar_message(("#" * self.bar_width) if thumb else "ERROR", green if thumb else red, always=True)
         self.bar_close()
-        self.added_submissions += [submission_id]
-        self.file_errors += [] if file else [submission_id]
-        self.thumbnail_errors += [] if thumb else [submission_id]
         return 0
 
+    def download_submission_parsed(self, submission_id: int, user_update: bool, favorites: Iterable[str] | None,
+                                   thumbnail: str) -> int:
+        self.bar_clear()
+        self.bar_message("DOWNLOAD")
+        if not (err := self.cached_error(submissions_table, submission_id)):
+            # Server errors are only known once the page is parsed, so the breaker records the parse result instead
+            self.breaker.wait()
+            self.count_request()
+            text, err = download_catch(get_page, self.api, join_url("view", submission_id))
+        if self.err_to_bar(err):
+            self.submission_errors += [submission_id]
+            return err
+        parsed: Future[Submission] = self._parse_pool.submit(parse_submission, text, self.api.raise_for_unauthorized)
+        self._queued_submissions.add(submission_id)
+        self._files_queue.append((
+            submission_id,
+            self._pool.submit(self.download_parsed_files, parsed, thumbnail,
+                              self.db.submissions.files_folder / tiered_path(submission_id)),
+            None,
+            lambda r, _: self.save_parsed_submission(submission_id, r, user_update, favorites, thumbnail)
+        ))
+        self.bar_message("QUEUED", green, always=True)
+        self.bar_close()
+        return 0
+
+    def download_parsed_files(self, parsed: Future[Submission], thumbnail: str, folder: Path
+                              ) -> tuple[Submission | None, int, Path | None, Path | None]:
+        submission, err = download_catch(parsed.result)
+        if err:
+            return None, err, None, None
+        file: Path | None = self.download_file(submission.file_url,
+                                               part_file(folder, "submission", submission.file_url), bar=False) \
+            if submission.file_url else None
+        thumbnail_url: str = submission.thumbnail_url or thumbnail
+        thumb: Path | None = self.download_file(thumbnail_url, part_file(folder, "thumbnail", thumbnail_url),
+                                                bar=False) if thumbnail_url else None
+        return submission, 0, file, thumb
+
+    def save_parsed_submission(self, submission_id: int,
+                               result: tuple[Submission | None, int, Path | None, Path | None],
+                               user_update: bool, favorites: Iterable[str] | None, thumbnail: str):
+        submission, err, file, thumb = result
+        if self.breaker.record(err):
+            self.download_submission_parsed(submission_id, user_update, favorites, thumbnail)
+            return
+        self.cache_error(submissions_table, submission_id, err)
+        if err:
+            self.submission_errors += [submission_id]
+            self._parse_errors.append(submission_id)
+            echo(f"{blue}{submission_id:010}{reset} {red}{error_messages[err]}{reset}", color=self.color)
+            return
+        self.save_submission(submission, user_update, favorites, file, thumb)
+        file_error: bool = bool(submission.file_url) and not file
+        thumb_error: bool = bool(submission.thumbnail_url or thumbnail) and not thumb
+        if file_error or thumb_error:
+            echo(f"{blue}{submission_id:010}{reset}" +
+                 (f" {red}FILE ERROR{reset}" if file_error else "") +
+                 (f" {red}THUMBNAIL ERROR{reset}" if thumb_error else ""),
+                 color=self.color)
+
     def download_user_folder(self, user: str, folder: str, downloader_entries: Callable[[str, P], tuple[list[T], P]],
                              page_start: P, entry_id_getter: Callable[[T], int | str], entry_formats: tuple[str, str],
                              contains: Callable[[T], dict | None],
@@ -422,11 +1471,38 @@ class Downloader:
                              clear_last_found: bool = False, clear_found: bool = False, replace_overwrite: bool = None,
                              save_added_entry: Callable[[int | str], Any] = lambda *_: None,
                              save_modified_entry: Callable[[int | str], Any] = lambda *_: None,
-                             save_error_entry: Callable[[int | str], Any] = lambda *_: None
-                             ) -> int:
+                             save_error_entry: Callable[[int | str], Any] = lambda *_: None,
+                             queued: Callable[[T], bool] = lambda _: False,
+                             use_mark: bool = False, date_getter: Callable[[T], datetime | None] | None = None,
+                             cursor_getter: Callable[[P], int] | None = None, since_update: bool = False) -> int:
         page: P | None = page_start
         page_i: int = 0
+        state: dict[str, Any] = self.get_state(user, folder) if use_mark or cursor_getter else {}
+        mark: int = state.get(FolderStateColumns.MARK.name, 0)
+        mark_top: int = 0
+        since: datetime | None = state.get(FolderStateColumns.UPDATED.name) \
+            if since_update and date_getter and stop > 0 else None
+        cursor_top: int = 0
+        cursor_stop: bool = False
+        mark_errors: list[int] = []
+        resumed_added: list[int | str] = []
+
+        def continues(entry: T) -> bool:
+            # The next page is only needed if the last entry of the current one does not trigger a stop condition
+            if use_mark and mark and entry_id_getter(entry) <= mark:
+                return False
+            elif since and (entry_date := date_getter(entry)) and entry_date < since:
+                return False
+            elif replace_overwrite if replace_overwrite is not None else self.replace:
+                return True
+            return not queued(entry) and contains(entry) is None
+
+        if self._resume_page and self._resume_page[:2] == (user, folder):
+            page = self._resume_page[2] or page_start
+            resumed_added = self._resume_added
+            self._resume_page = None
         while page:
+            self.check_budget()
             page_i += 1
             page_width: int = len(str(page_i))
             folder_page_width: int = len(user) + 1 + len(folder) + 1 + page_width
@@ -436,17 +1512,33 @@ class Downloader:
                  nl=self.output == OutputType.simple, color=self.color)
             self.bar()
             self.bar_message("DOWNLOAD")
-            result, err = download_catch(downloader_entries, user, page)
+            result, err = self.download_listing(user, folder, page, downloader_entries)
             if err:
                 self.user_errors += [user]
                 self.err_to_bar(err)
                 return err
             self.bar_close("")
             self.clear_line()
+            self.refresh_indexes()
             entries: list[T] = result[0]
             page = result[1]
+            if cursor_getter and page:
+                cursor_top = cursor_top or cursor_getter(page)
+                cursor_stop = since_update and stop > 0 and 0 < cursor_getter(page) <= mark
+            if page and stop != 0 and not cursor_stop and (stop < 0 or (entries and continues(entries[-1]))):
+                self.prefetch_listing(user, folder, page, downloader_entries)
             entries_width: int = w if (w := len(str(len(entries)))) > 1 else 2
             for i, entry in enumerate(entries, 1):
+                self.check_budget()
+                if use_mark and stop > 0 and mark and entry_id_getter(entry) <= mark:
+                    self.drop_listings(user, folder)
+                    page = None
+                    break
+                if since and (entry_date := date_getter(entry)) and entry_date < since:
+                    self.drop_listings(user, folder)
+                    page = None
+                    break
+                mark_top = max(mark_top, entry_id_getter(entry)) if use_mark else 0
                 t_width: int = terminal_width()
                 available_space: int = t_width - self.bar_width - 2 - 1 - 1
                 entry_num: str = f"{page_i}/{i:0{entries_width}}"
@@ -468,8 +1560,10 @@ class Downloader:
                      nl=self.output == OutputType.simple, color=self.color)
                 self.bar()
                 self.bar_message("SEARCHING")
-                db_entry: dict | None = contains(entry)
-                if db_entry and not (replace_overwrite if replace_overwrite is not None else self.replace):
+                entry_queued: bool = queued(entry)
+                db_entry: dict | None = contains(entry) if not entry_queued else None
+                if entry_queued or \
+                        (db_entry and not (replace_overwrite if replace_overwrite is not None else self.replace)):
                     self.bar_message("IN DB", green, always=True)
                     if self.dry_run:
                         stop -= 1
@@ -478,13 +1572,13 @@ class Downloader:
                             self.clear_line()
                     else:
                         modified: bool = False
-                        for check, message in modify_checks:
+                        for check, message in modify_checks if not entry_queued else []:
                             if modified := check(entry, db_entry):
-                                self.db.commit()
+                                self.commit()
                                 self.bar_message(message or "UPDATED", green, always=True)
                                 save_modified_entry(entry_id_getter(entry))
                                 break
-                        if not modified:
+                        if not modified and entry_id_getter(entry) not in resumed_added:
                             stop -= 1
                             if clear_found or (clear_last_found and stop == 0):
                                 self.bar_close("")
@@ -497,16 +1591,38 @@ class Downloader:
                         self.bar_message(save[1], green, always=True)
                     if err:
                         save_error_entry(entry_id_getter(entry))
+                        mark_errors.append(entry_id_getter(entry))
                     else:
                         save_added_entry(entry_id_getter(entry))
+                        if stop > 0:
+                            self.add_checkpoint_entry(CheckpointTable.added, entry_id_getter(entry))
                 self.bar_close()
+                self.save_queued_files()
                 if stop == 0:
+                    self.drop_listings(user, folder)
                     page = None
                     break
+            if cursor_stop:
+                self.drop_listings(user, folder)
+                page = None
+            self.save_queued_files(wait=True)
+            for error_id in self._parse_errors:
+                save_error_entry(error_id)
+                mark_errors.append(error_id)
+            self._parse_errors.clear()
+            self.save_checkpoint(page=page)
+            self.commit(force=True)
             self.clear_line()
+        if use_mark and not self.dry_run:
+            self.set_state(user, folder, mark=max(mark, min(mark_top, min(mark_errors, default=mark_top + 1) - 1)))
+            self.commit(force=True)
+        elif cursor_getter and cursor_top and not mark_errors and not self.dry_run:
+            self.set_state(user, folder, mark=max(mark, cursor_top))
+            self.commit(force=True)
         return 0
 
-    def download_user_journals(self, user: str, stop: int = -1, clear_last_found: bool = False) -> int:
+    def download_user_journals(self, user: str, stop: int = -1, clear_last_found: bool = False,
+                               since_update: bool = False) -> int:
         def save(journal: JournalPartial, _db_entry: dict | None) -> int:
             if self.save_comments or not self.content_only:
                 return self.download_journal(journal.id, True, self.replace)
@@ -520,35 +1636,37 @@ class Downloader:
                      JournalsColumns.FOOTER.name: "",
                      },
                     replace=self.replace)
-                self.db.commit()
+                self.commit()
+                self.index_journal(journal.id)
             return 0
 
         err = self.download_user_folder(
             user=user, folder=Folder.journals, downloader_entries=self.api.journals, page_start=1,
             entry_id_getter=lambda j: j.id,
             entry_formats=("{0.id:010}", "{0.title}"),
-            contains=lambda j: self.db.journals[j.id],
-            modify_checks=[(lambda journal, _: self.db.journals.set_user_update(journal.id, True), "")],
+            contains=lambda j: self.journal_entry(j.id),
+            modify_checks=[(lambda _, entry: self.update_journal(entry, user_update=True), "")],
             save=(save, "ADDED"),
             stop=stop, clear_last_found=clear_last_found,
             save_added_entry=lambda a: self.added_journals.append(a),
             save_modified_entry=lambda m: self.modified_journals.append(m),
             save_error_entry=lambda e: self.journal_errors.append(e),
+            use_mark=True,
+            date_getter=lambda j: j.date,
+            since_update=since_update,
         )
         return err
 
     def download_user_submissions(self, user: str, folder: str, stop: int = -1,
-                                  clear_last_found: bool = False) -> int:
+                                  clear_last_found: bool = False, since_update: bool = False) -> int:
         downloader: _FolderDownloader = get_downloader(self.api, folder)
         page_start: int | str = "/" if folder == Folder.favorites else 1
         modify_checks: list[tuple[Callable[[SubmissionPartial, dict], bool], str]]
 
         if folder == Folder.favorites:
-            modify_checks = [(lambda submission, _: self.db.submissions.add_favorite(submission.id, user),
-                              "ADDED FAV")]
+            modify_checks = [(lambda _, entry: self.update_submission(entry, favorite=user), "ADDED FAV")]
         else:
-            modify_checks = [(lambda submission, _: (self.db.submissions.set_user_update(submission.id, True) +
-                                                     self.db.submissions.set_folder(submission.id, folder)),
+            modify_checks = [(lambda _, entry: self.update_submission(entry, user_update=True, folder=folder),
                               "UPDATED")]
 
         def save(sub_partial: SubmissionPartial, db_entry: dict | None, ) -> int:
@@ -564,11 +1682,17 @@ class Downloader:
             user=user, folder=folder, downloader_entries=downloader, page_start=page_start,
             entry_id_getter=lambda s: s.id,
             entry_formats=("{0.id:010}", "{0.title}"),
-            contains=lambda s: self.db.submissions[s.id],
+            contains=lambda s: self.submission_entry(s.id),
+            queued=lambda s: s.id in self._queued_submissions,
             modify_checks=modify_checks,
             save=(save, ""),
             stop=stop, clear_last_found=clear_last_found,
             save_modified_entry=lambda m: self.modified_submissions.append(m),
+            use_mark=folder != Folder.favorites,
+            date_getter=(lambda s: thumbnail_date(s.thumbnail_url)) if folder != Folder.favorites else None,
+            cursor_getter=(lambda p: int(m[0]) if (m := match(r"\d+", str(p))) else 0)
+            if folder == Folder.favorites else None,
+            since_update=since_update,
         )
         return err
 
@@ -618,7 +1742,7 @@ class Downloader:
             self.clear_line()
             return 0
         self.bar_message("DOWNLOAD")
-        user, err = download_catch(self.api.user, username)
+        user, err = self.download_listing(username, Folder.userpage, 1, self.api.user)
         self.err_to_bar(err)
         if err:
             self.user_errors += [username]
@@ -644,7 +1768,7 @@ class Downloader:
              color=self.color)
         self.bar()
         self.bar_message("DOWNLOAD")
-        user, err = download_catch(self.api.me)
+        user, err = self.download_catch(self.api.me)
         if self.err_to_bar(err) or not user:
             self.user_errors += ["@me"]
             return "", err
@@ -657,9 +1781,24 @@ class Downloader:
         self.bar_close()
         return user.name_url, err
 
-    def _download_users(self, users_folders: Iterable[tuple[str, list[str]]], stop: int = -1):
+    def _download_users(self, users_folders: list[tuple[str, list[str]]], stop: int = -1, resume: bool = False,
+                        probe: bool = False, since_update: bool = False):
         operation: str = "Downloading" if stop < 0 else "Updating"
-        for user, folders in users_folders:
+        checkpoint: dict[str, Any] = self.load_checkpoint(operation) if resume else {}
+        if not checkpoint:
+            self.clear_checkpoint()
+        finished: set[str] = {*checkpoint.get(CheckpointTable.finished, [])}
+        users_folders = [(u, fs) for u, fs in users_folders if u not in finished]
+        self._checkpoint = {"operation": operation}
+        if (user_resume := checkpoint.get("user")) and (folder_resume := checkpoint.get("folder")):
+            self._resume_page = (user_resume, folder_resume, checkpoint.get("page"))
+            self._resume_added = checkpoint.get(CheckpointTable.added, [])
+            users_folders = [(u, fs[next((i for i, f in enumerate(fs) if f.split(":")[0] == folder_resume), 0):]
+                              if u == user_resume else fs)
+                             for u, fs in users_folders]
+        for i, (user, folders) in enumerate(users_folders):
+            self.prefetch_users([(u, [Folder.userpage]) for u, _ in users_folders[i:i + self.workers]] if probe
+                                else users_folders[i:i + self.workers])
             user_added: bool = False
             user_downloaded: bool = False
             if not self.dry_run:
@@ -668,10 +1807,21 @@ class Downloader:
                                              UsersColumns.FOLDERS.name: {},
                                              UsersColumns.ACTIVE.name: True,
                                              UsersColumns.USERPAGE.name: ""})
-                    self.db.commit()
+                    self.commit(force=True)
                     self.added_users += [user]
                 self.db.users.set_active(user, True)
+            counts: dict[str, int] = {}
+            if probe:
+                folders, counts = self.probe_user(user, folders)
             for folder in folders:
+                added_before: int = self.added_count()
+                started: datetime = datetime.now()
+                if self._resume_page and self._resume_page[:2] == (user, folder.split(":")[0]):
+                    self.save_checkpoint(user=user, folder=folder.split(":")[0], page=self._resume_page[2])
+                else:
+                    self.clear_checkpoint_entries(CheckpointTable.added)
+                    self.save_checkpoint(user=user, folder=folder.split(":")[0], page=None)
+                self.check_budget()
                 echo(f"{operation}: {yellow}{user}{reset}/{yellow}{folder.split(':')[0]}{reset}", color=self.color)
                 if not self.dry_run:
                     if folder.startswith(w := Folder.watchlist_by) and \
@@ -690,17 +1840,21 @@ class Downloader:
                 if folder == Folder.userpage:
                     err = self.download_user_page(user, stop == 1)
                 elif folder == Folder.journals:
-                    err = self.download_user_journals(user, stop, stop == 1)
+                    err = self.download_user_journals(user, stop, stop == 1, since_update)
                 elif folder in (Folder.gallery, Folder.scraps, Folder.favorites):
-                    err = self.download_user_submissions(user, folder, stop, stop == 1)
+                    err = self.download_user_submissions(user, folder, stop, stop == 1, since_update)
                 elif folder.startswith(Folder.watchlist_by):
                     err = self.download_user_watchlist(user, Folder.watchlist_by, folder.split(":")[1:], stop == 1)
                 elif folder.startswith(Folder.watchlist_to):
                     err = self.download_user_watchlist(user, Folder.watchlist_to, folder.split(":")[1:], stop == 1)
                 else:
                     raise Exception(f"Unknown folder {folder}")
+                self.save_queued_files(wait=True)
                 if not err:
                     user_downloaded = True
+                    if not self.dry_run:
+                        self.set_state(user, folder.split(":")[0], count=counts.get(folder),
+                                       hit=self.added_count() > added_before, updated=started)
                 elif not self.dry_run and err in (1, 2):
                     if user_added and not user_downloaded:
                         del self.db.users[user]
@@ -708,21 +1862,79 @@ class Downloader:
                     else:
                         self.db.users.set_active(user, False)
                         self.user_deactivated += [user]
-                    self.db.commit()
+                    self.commit(force=True)
                     break
                 self.bar_close()
-                self.db.commit()
+                self.commit(force=True)
+            self.drop_listings(user)
+            self.add_checkpoint_entry(CheckpointTable.finished, user)
+            self.clear_checkpoint_entries(CheckpointTable.added)
+            self.save_checkpoint(user=None, folder=None, page=None)
+            self.commit(force=True)
+        self.clear_checkpoint()
+        self.commit(force=True)
+
+    def _download_inbox(self, users_folders: list[tuple[str, list[str]]], stop: int = -1):
+        users_submissions: set[str] = {u for u, fs in users_folders
+                                       if Folder.gallery in fs or Folder.scraps in fs}
+        users_journals: set[str] = {u for u, fs in users_folders if Folder.journals in fs}
+        self._checkpoint_enabled = False
+
+        def listing(users_: set[str], inbox: Callable[[FAAPI, str], tuple[list[T], str | None]]
+                    ) -> Callable[[str, str], tuple[list[T], str | None]]:
+            def inner(_user: str, page: str) -> tuple[list[T], str | None]:
+                entries, next_page = inbox(self.api, page)
+                return [e for e in entries if clean_username(e.author.name) in users_], next_page
+
+            return inner
+
+        if users_submissions:
+            echo(f"Updating: {yellow}inbox{reset}/{yellow}submissions{reset}", color=self.color)
+            self.download_user_folder(
+                user="inbox", folder="submissions",
+                downloader_entries=listing(users_submissions, inbox_submissions), page_start="msg/submissions",
+                entry_id_getter=lambda s: s.id,
+                entry_formats=("{0.id:010}", "{0.title}"),
+                contains=lambda s: self.submission_entry(s.id),
+                queued=lambda s: s.id in self._queued_submissions,
+                modify_checks=[(lambda _, entry: self.update_submission(entry, user_update=True), "UPDATED")],
+                save=(lambda sub, _: self.download_submission(sub.id, True, None, sub.thumbnail_url), ""),
+                stop=stop, clear_last_found=stop == 1,
+                save_modified_entry=lambda m: self.modified_submissions.append(m),
+            )
+            self.save_queued_files(wait=True)
+            self.bar_close()
+            self.commit(force=True)
+        if users_journals:
+            echo(f"Updating: {yellow}inbox{reset}/{yellow}journals{reset}", color=self.color)
+            self.download_user_folder(
+                user="inbox", folder="journals",
+                downloader_entries=listing(users_journals, inbox_journals), page_start="msg/others",
+                entry_id_getter=lambda j: j.id,
+                entry_formats=("{0.id:010}", "{0.title}"),
+                contains=lambda j: self.journal_entry(j.id),
+                modify_checks=[(lambda _, entry: self.update_journal(entry, user_update=True), "")],
+                save=(lambda journal, _: self.download_journal(journal.id, True), "ADDED"),
+                stop=stop, clear_last_found=stop == 1,
+                save_added_entry=lambda a: self.added_journals.append(a),
+                save_modified_entry=lambda m: self.modified_journals.append(m),
+                save_error_entry=lambda e: self.journal_errors.append(e),
+            )
+            self.bar_close()
+            self.commit(force=True)
 
-    def download_users(self, users: list[str], folders: list[str]):
+    def download_users(self, users: list[str], folders: list[str], resume: bool = False):
         if "@me" in users:
             if me := self.download_me()[0]:
                 users[users.index("@me")] = me
             else:
                 users.remove("@me")
 
-        self._download_users([(u, folders) for u in users])
+        self._download_users([(u, folders) for u in users], resume=resume)
 
-    def download_users_update(self, users: list[str], folders: list[str], stop: int, deactivated: bool, like: bool):
+    def download_users_update(self, users: list[str], folders: list[str], stop: int, deactivated: bool, like: bool,
+                              resume: bool = False, probe: bool = False, from_inbox: bool = False,
+                              priority: bool = False, min_yield: float = 0, since_update: bool = False):
         if not like:
             for user in [u for u in users if u != "@me" and u not in self.db.users]:
                 padding: int = terminal_width() - 1 - self.bar_width - 2
@@ -758,11 +1970,59 @@ class Downloader:
             users_folders = [(u, sorted(fs, key=lambda f: Folder.as_list().index(f.split(":")[0])))
                              for u, fs in users_folders]
 
+        if priority and not from_inbox:
+            users_folders = self.prioritise_users(users_folders, min_yield)
+
         if not users_folders:
             return echo("No users to update")
 
         self.replace = False
-        self._download_users(users_folders, stop)
+        if from_inbox:
+            self._download_inbox(users_folders, stop)
+        else:
+            self._download_users(users_folders, stop, resume, probe, since_update)
+
+    def download_backfill(self, missing: bool = False):
+        attempted: set[int] = set()
+        if not self.backfill_entries(missing):
+            return echo("No pending files")
+        while queue := [q for q in self.backfill_entries(missing) if q[0] not in attempted]:
+            header_width: int = (len(str(len(queue))) * 2) + 2
+            for i, (submission_id, file_url, thumbnail_url) in enumerate(queue, 1):
+                self.check_budget()
+                attempted.add(submission_id)
+                echo(f"{i}/{len(queue)}".ljust(header_width) + f"{blue}{submission_id:010}{reset} ",
+                     nl=self.output == OutputType.simple, color=self.color)
+                self.bar()
+                if self.dry_run:
+                    self.bar_message("SKIPPED", green)
+                    self.bar_close()
+                    continue
+                elif self._pool is not None:
+                    self.queue_files(submission_id, file_url, thumbnail_url,
+                                     partial(self.save_backfill, submission_id, file_url, thumbnail_url))
+                    self.bar_message("QUEUED", green, always=True)
+                    self.bar_close()
+                    self.save_queued_files()
+                    continue
+                folder: Path = self.db.submissions.files_folder / tiered_path(submission_id)
+                self.bar_clear()
+                self.bar_close("\b")
+                self.bar(7)
+                file: Path | None = self.download_file(file_url, part_file(folder, "submission", file_url)) \
+                    if file_url else None
+                self.bar_message(("#" * self.bar_width) if file or not file_url else "ERROR",
+                                 green if file or not file_url else red, always=True)
+                self.bar_close("]")
+                self.bar(1)
+                thumb: Path | None = self.download_file(thumbnail_url, part_file(folder, "thumbnail", thumbnail_url)) \
+                    if thumbnail_url else None
+                self.save_backfill(submission_id, file_url, thumbnail_url, file, thumb)
+                self.bar_message(("#" * self.bar_width) if thumb or not thumbnail_url else "ERROR",
+                                 green if thumb or not thumbnail_url else red, always=True)
+                self.bar_close()
+            self.save_queued_files(wait=True)
+            self.commit(force=True)
 
     # noinspection DuplicatedCode
     def download_submissions(self, submission_ids: list[int]):
@@ -785,6 +2045,9 @@ class Downloader:
                                      entry.get(SubmissionsColumns.USERUPDATE.name, False),
                                      entry.get(SubmissionsColumns.FAVORITE.name, {}),
                                      "", self.replace)
+            self.save_queued_files()
+        self.save_queued_files(wait=True)
+        self.commit(force=True)
 
     # noinspection DuplicatedCode
     def download_journals(self, journal_ids: list[int]):
@@ -803,24 +2066,14 @@ class Downloader:
                 self.bar_message("SKIPPED", green)
                 self.bar_close()
                 continue
-            journal, err = download_catch(self.api.journal, journal_id)
+            journal, err = self.download_catch_cached(journals_table, journal_id, self.api.journal, journal_id)
             if self.err_to_bar(err):
-                self.journal_errors += [journal.id]
+                self.journal_errors += [journal_id]
                 continue
-            self.db.journals.save_journal({
-                **format_entry(dict(journal), self.db.journals.columns),
-                (u := JournalsColumns.USERUPDATE.name): entry.get(u, False),
-                JournalsColumns.AUTHOR.name: journal.author.name,
-                JournalsColumns.CONTENT.name: journal.content_bbcode if self.bbcode else journal.content,
-                JournalsColumns.HEADER.name: (journal.header_bbcode if self.bbcode else journal.header)
-                if not self.content_only else "",
-                JournalsColumns.FOOTER.name: (journal.footer_bbcode if self.bbcode else journal.footer)
-                if not self.content_only else "",
-            }, replace=self.replace)
-            if self.save_comments:
-                save_comments(self.db, journals_table, journal.id, journal.comments,
-                              replace=self.replace, bbcode=self.bbcode)
-            self.added_journals += [journal.id]
-            self.db.commit()
-            self.bar_message("ADDED", green, always=True)
+            if self.save_journal(journal, entry.get(JournalsColumns.USERUPDATE.name, False), self.replace):
+                self.added_journals += [journal.id]
+                self.bar_message("ADDED", green, always=True)
+            else:
+                self.bar_message("UNCHANGED", green, always=True)
             self.bar_close()
+        self.commit(force=True)
@@ -0,0 +1,47 @@
+from pathlib import Path
+from sqlite3 import Connection
+from sqlite3 import connect
+from tempfile import gettempdir
+from threading import local
+from time import sleep
+from time import time
+
+
+class RateLimiter:
+    pages: str = "pages"
+    files: str = "files"
+
+    def __init__(self, rates: dict[str, float], path: Path = Path(gettempdir()) / "falocalrepo-ratelimit.db"):
+        self.rates: dict[str, float] = rates
+        self.path: Path = path
+        self._local: local = local()
+
+    @property
+    def connection(self) -> Connection:
+        if (conn := getattr(self._local, "connection", None)) is None:
+            conn = self._local.connection = connect(self.path, timeout=60, isolation_level=None)
+            conn.execute("create table if not exists BUCKETS"
+                         " (NAME text primary key, TOKENS real not null, UPDATED real not null)")
+        return conn
+
+    def acquire(self, bucket: str):
+        rate: float = self.rates[bucket]
+        capacity: float = max(1., rate)
+        while True:
+            conn: Connection = self.connection
+            conn.execute("begin immediate")
+            try:
+                now: float = time()
+                row: tuple[float, float] | None = conn.execute("select TOKENS, UPDATED from BUCKETS where NAME = ?",
+                                                               [bucket]).fetchone()
+                tokens: float = capacity if row is None else min(capacity, row[0] + max(0., now - row[1]) * rate)
+                wait: float = 0 if tokens >= 1 else (1 - tokens) / rate
+                conn.execute("insert or replace into BUCKETS (NAME, TOKENS, UPDATED) values (?, ?, ?)",
+                             [bucket, tokens - 1 if not wait else tokens, now])
+                conn.execute("commit")
+            except BaseException:
+                conn.execute("rollback")
+                raise
+            if not wait:
+                return
+            sleep(wait)
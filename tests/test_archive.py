@@ -0,0 +1,55 @@
+from io import BytesIO
+from pathlib import Path
+
+from requests import PreparedRequest
+from requests import Request
+from requests import Response
+from urllib3 import HTTPResponse
+
+from falocalrepo.archive import ResponseArchive
+
+
+def make_request(url: str) -> PreparedRequest:
+    return Request("GET", url).prepare()
+
+
+def make_response(request: PreparedRequest, data: bytes) -> Response:
+    response: Response = Response()
+    response.status_code = 200
+    response.reason = "OK"
+    response.headers["Content-Type"] = "text/html; charset=utf-8"
+    response.url = request.url
+    response.request = request
+    response.raw = HTTPResponse(BytesIO(data), preload_content=False)
+    return response
+
+
+def test_archive_record_replay(tmp_path: Path):
+    data: bytes = b"<html>page</html>" * 1000
+    request: PreparedRequest = make_request("https://www.furaffinity.net/view/1/")
+    response: Response = make_response(request, data)
+
+    ResponseArchive(tmp_path).add(request, response)
+
+    assert response.content == data
+    assert not list(tmp_path.glob("*.part"))
+
+    replayed: Response = ResponseArchive(tmp_path).response(request)
+
+    assert replayed.status_code == 200
+    assert replayed.headers["Content-Type"] == "text/html; charset=utf-8"
+    assert replayed.text == data.decode()
+    assert replayed.raw.file.closed
+    assert ResponseArchive(tmp_path).response(make_request("https://www.furaffinity.net/view/2/")) is None
+
+
+def test_archive_record_closed(tmp_path: Path):
+    request: PreparedRequest = make_request("https://www.furaffinity.net/view/1/")
+    response: Response = make_response(request, b"page")
+    archive: ResponseArchive = ResponseArchive(tmp_path)
+
+    archive.add(request, response)
+    response.close()
+
+    assert not list(tmp_path.glob("*.part"))
+    assert archive.response(request) is None
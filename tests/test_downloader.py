@@ -0,0 +1,350 @@
+from datetime import datetime
+from pathlib import Path
+from types import SimpleNamespace
+from typing import Callable
+from typing import Iterator
+
+from faapi import Submission
+from faapi.exceptions import NoticeMessage
+from faapi.exceptions import ServerError
+from falocalrepo_database import Database
+from falocalrepo_database.tables import SubmissionsColumns
+from falocalrepo_database.tables import submissions_table
+from pytest import fixture
+from pytest import raises
+
+from falocalrepo.downloader import CheckpointTable
+from falocalrepo.downloader import CircuitBreaker
+from falocalrepo.downloader import Downloader
+from falocalrepo.downloader import FingerprintsColumns
+from falocalrepo.downloader import Folder
+from falocalrepo.downloader import FolderStateColumns
+from falocalrepo.downloader import IDIndex
+from falocalrepo.downloader import content_range
+from falocalrepo.downloader import release_file
+from falocalrepo.downloader import store_file
+
+
+@fixture
+def db(tmp_path: Path) -> Database:
+    database: Database = Database(tmp_path / "FA.db", init=True)
+    database.settings.files_folder = "FA.files"
+    database.commit()
+    yield database
+    database.close()
+
+
+def make_submission(submission_id: int) -> Submission:
+    submission: Submission = Submission()
+    submission.id = submission_id
+    submission.title = f"Submission {submission_id}"
+    submission.author.name = "tom"
+    submission.date = datetime(2020, 1, 1)
+    submission.tags = ["tag"]
+    submission.category = "Artwork (Digital)"
+    submission.species = "Unspecified / Any"
+    submission.gender = "Any"
+    submission.rating = "General"
+    submission.type = "image"
+    submission.description = "description"
+    submission.footer = "footer"
+    submission.file_url = f"https://d.furaffinity.net/art/tom/1600000000/{submission_id}.tom_file.png"
+    submission.thumbnail_url = f"https://t.furaffinity.net/{submission_id}@600-1600000000.jpg"
+    submission.folder = "gallery"
+    submission.favorite = True
+    return submission
+
+
+def make_partial(submission_id: int) -> SimpleNamespace:
+    return SimpleNamespace(id=submission_id, title=f"Submission {submission_id}",
+                           thumbnail_url=f"https://t.furaffinity.net/{submission_id}@400-1600000000.jpg")
+
+
+def fake_download_submission(downloader: Downloader):
+    def download_submission(submission_id: int, user_update: bool, favorites: list[str] | None, _thumbnail: str,
+                            replace: bool = False) -> int:
+        downloader.save_submission(make_submission(submission_id), user_update, favorites, None, None, replace)
+        return 0
+
+    downloader.download_submission = download_submission
+
+
+class Interrupted(Exception):
+    pass
+
+
+class FakeStream:
+    def __init__(self, data: bytes, status_code: int = 200, headers: dict[str, str] | None = None):
+        self.data: bytes = data
+        self.status_code: int = status_code
+        self.headers: dict[str, str] = {"Content-Length": str(len(data)), **(headers or {})}
+
+    def __enter__(self) -> "FakeStream":
+        return self
+
+    def __exit__(self, *_):
+        pass
+
+    def raise_for_status(self):
+        pass
+
+    def iter_content(self, chunk_size: int = 1) -> Iterator[bytes]:
+        yield from (self.data[i:i + chunk_size] for i in range(0, len(self.data), chunk_size))
+
+
+class FakeSession:
+    def __init__(self, respond: Callable[[dict[str, str]], FakeStream]):
+        self.respond: Callable[[dict[str, str]], FakeStream] = respond
+        self.requests: list[dict[str, str]] = []
+
+    def get(self, _url: str, *, headers: dict[str, str] | None = None, **_kwargs) -> FakeStream:
+        self.requests.append(headers or {})
+        return self.respond(headers or {})
+
+
+def test_save_submission(db: Database):
+    downloader: Downloader = Downloader(db, SimpleNamespace(), color=False)
+    submission: Submission = make_submission(1)
+
+    downloader.save_submission(submission, True, ["jerry"], None, None)
+
+    entry: dict = db.submissions[submission.id]
+    assert entry[SubmissionsColumns.TITLE.name] == submission.title
+    assert entry[SubmissionsColumns.FAVORITE.name] == {"jerry"}
+    assert entry[SubmissionsColumns.USERUPDATE.name] is True
+    assert entry[SubmissionsColumns.FILESAVED.name] == 0
+    assert downloader.get_fingerprint(submissions_table, submission.id)[FingerprintsColumns.METADATA.name]
+
+
+def test_save_submission_fingerprint_ignores_favorites(db: Database):
+    downloader: Downloader = Downloader(db, SimpleNamespace(), color=False)
+    submission: Submission = make_submission(1)
+
+    downloader.save_submission(submission, True, ["jerry"], None, None)
+    saved: str = downloader.get_fingerprint(submissions_table, 1)[FingerprintsColumns.METADATA.name]
+    submission.favorite = False
+    downloader.save_submission(submission, False, None, None, None, replace=True)
+
+    assert downloader.get_fingerprint(submissions_table, 1)[FingerprintsColumns.METADATA.name] == saved
+
+
+def test_id_index():
+    index: IDIndex = IDIndex([1, 8, 15], 15)
+
+    assert 1 in index and 8 in index and 15 in index
+    assert 0 not in index and 2 not in index and 16 not in index and 10 ** 6 not in index
+
+    index.add(10 ** 6)
+
+    assert 10 ** 6 in index
+    assert 10 ** 6 - 1 not in index
+
+
+def test_submissions_index(db: Database):
+    downloader: Downloader = Downloader(db, SimpleNamespace(), color=False)
+    downloader.save_submission(make_submission(5), True, None, None, None)
+    db.commit()
+
+    assert 5 in Downloader(db, SimpleNamespace(), color=False).submissions_index
+    assert 5 in downloader.submissions_index
+    assert 6 not in downloader.submissions_index
+
+    downloader.save_submission(make_submission(6), True, None, None, None)
+
+    assert 6 in downloader.submissions_index
+    assert downloader.submission_entry(6)[SubmissionsColumns.ID.name] == 6
+
+
+def test_content_range():
+    assert content_range("bytes 10-19/20") == (10, 19, 20)
+    assert content_range(" bytes 0-9/* ") == (0, 9, 0)
+    assert content_range("bytes */20") == (-1, -1, 20)
+    assert content_range("bytes 10-19") == (-1, -1, -1)
+    assert content_range("") == (-1, -1, -1)
+
+
+def test_download_bytes_resume(db: Database, tmp_path: Path):
+    data: bytes = b"0123456789"
+    session: FakeSession = FakeSession(lambda h: FakeStream(data[3:], 206, {"Content-Range": "bytes 3-9/10"})
+                                       if h.get("Range") == "bytes=3-" else FakeStream(data))
+    downloader: Downloader = Downloader(db, SimpleNamespace(session=session), color=False)
+    (file := tmp_path / "file.part").write_bytes(data[:3])
+
+    assert downloader.download_bytes("https://d.furaffinity.net/file", file, bar=False) == file
+    assert file.read_bytes() == data
+    assert session.requests == [{"Range": "bytes=3-"}]
+
+
+def test_download_bytes_resume_ignored(db: Database, tmp_path: Path):
+    data: bytes = b"0123456789"
+    session: FakeSession = FakeSession(lambda _: FakeStream(data))
+    downloader: Downloader = Downloader(db, SimpleNamespace(session=session), color=False)
+    (file := tmp_path / "file.part").write_bytes(b"abc")
+
+    assert downloader.download_bytes("https://d.furaffinity.net/file", file, bar=False) == file
+    assert file.read_bytes() == data
+
+
+def test_download_bytes_resume_encoded(db: Database, tmp_path: Path):
+    data: bytes = b"0123456789"
+    session: FakeSession = FakeSession(lambda _: FakeStream(data, headers={"Content-Length": "4",
+                                                                           "Content-Encoding": "gzip"}))
+    downloader: Downloader = Downloader(db, SimpleNamespace(session=session), color=False)
+    (file := tmp_path / "file.part").write_bytes(data[:3])
+
+    assert downloader.download_bytes("https://d.furaffinity.net/file", file, bar=False) == file
+    assert file.read_bytes() == data
+    assert session.requests == [{"Range": "bytes=3-"}, {}]
+
+
+def test_circuit_breaker():
+    probes: list[bool] = [False, True]
+    pauses: list[bool] = []
+    breaker: CircuitBreaker = CircuitBreaker(lambda: probes.pop(0), threshold=3, pause=0,
+                                             on_pause=lambda: pauses.append(True))
+
+    assert not breaker.record(3)
+    assert not breaker.record(3)
+    assert not breaker.record(0)
+    assert not breaker.record(3)
+    assert not breaker.record(3)
+    assert breaker.record(3)
+    assert pauses == [True]
+    assert probes == []
+    assert breaker.failures == 0
+    assert not breaker.record(3)
+
+
+def test_circuit_breaker_notices(db: Database):
+    probes: list[bool] = []
+    downloader: Downloader = Downloader(db, SimpleNamespace(), color=False)
+    downloader.breaker = CircuitBreaker(lambda: probes.append(True) or True, threshold=2, pause=0)
+
+    def notice():
+        raise NoticeMessage()
+
+    for _ in range(5):
+        assert downloader.download_catch(notice) == (None, 4)
+    assert probes == []
+    assert downloader.breaker.failures == 0
+
+    errors: list[Exception] = [ServerError(), ServerError()]
+
+    def server_error() -> str:
+        if errors:
+            raise errors.pop(0)
+        return "page"
+
+    assert downloader.download_catch(server_error) == (None, 3)
+    assert probes == []
+    assert downloader.download_catch(server_error) == ("page", 0)
+    assert probes == [True]
+
+
+def test_checkpoint(db: Database):
+    downloader: Downloader = Downloader(db, SimpleNamespace(), color=False)
+    downloader.save_checkpoint(operation="Downloading", user="tom", folder="gallery", page=2)
+    downloader.add_checkpoint_entry(CheckpointTable.finished, "jerry")
+    downloader.add_checkpoint_entry(CheckpointTable.added, 5)
+
+    checkpoint: dict = Downloader(db, SimpleNamespace(), color=False).load_checkpoint("Downloading")
+
+    assert checkpoint["user"] == "tom" and checkpoint["folder"] == "gallery" and checkpoint["page"] == 2
+    assert checkpoint[CheckpointTable.finished] == ["jerry"]
+    assert checkpoint[CheckpointTable.added] == [5]
+    assert downloader.load_checkpoint("Updating") == {}
+
+    downloader.clear_checkpoint()
+
+    assert downloader.load_checkpoint("Downloading") == {}
+
+
+def test_download_users_resume(db: Database):
+    pages: dict[str, list[list[int]]] = {u: [[k + 4, k + 3], [k + 2, k + 1]]
+                                         for u, k in (("a", 0), ("b", 10), ("c", 20))}
+    requests: list[tuple[str, int]] = []
+    interrupt: list[tuple[str, int]] = [("b", 2)]
+
+    def gallery(user: str, page: int) -> tuple[list[SimpleNamespace], int | None]:
+        if (user, page) in interrupt:
+            interrupt.remove((user, page))
+            raise Interrupted
+        requests.append((user, page))
+        return list(map(make_partial, pages[user][page - 1])), page + 1 if page < len(pages[user]) else None
+
+    downloader: Downloader = Downloader(db, SimpleNamespace(gallery=gallery), color=False)
+    fake_download_submission(downloader)
+    with raises(Interrupted):
+        downloader.download_users(["a", "b", "c"], [Folder.gallery])
+    requests.clear()
+
+    downloader = Downloader(db, SimpleNamespace(gallery=gallery), color=False)
+    fake_download_submission(downloader)
+    downloader.download_users(["a", "b", "c"], [Folder.gallery], resume=True)
+
+    assert requests == [("b", 2), ("c", 1), ("c", 2)]
+    assert sorted(db.submissions.select(columns=[SubmissionsColumns.ID]).tuples) == \
+           [(i,) for i in (1, 2, 3, 4, 11, 12, 13, 14, 21, 22, 23, 24)]
+    assert downloader.load_checkpoint("Downloading") == {}
+
+
+def test_download_user_submissions_mark(db: Database):
+    requests: list[int] = []
+
+    def gallery(_user: str, page: int) -> tuple[list[SimpleNamespace], int | None]:
+        requests.append(page)
+        return list(map(make_partial, range(30 - (page - 1) * 10, 20 - (page - 1) * 10, -1))), page + 1
+
+    downloader: Downloader = Downloader(db, SimpleNamespace(gallery=gallery), color=False)
+    fake_download_submission(downloader)
+    downloader.set_state("tom", Folder.gallery, mark=25)
+
+    assert downloader.download_user_submissions("tom", Folder.gallery, stop=1) == 0
+    assert requests == [1]
+    assert sorted(db.submissions.select(columns=[SubmissionsColumns.ID]).tuples) == [(i,) for i in range(26, 31)]
+    assert downloader.get_state("tom", Folder.gallery)[FolderStateColumns.MARK.name] == 30
+
+
+def test_download_user_favorites_cursor(db: Database):
+    requests: list[str] = []
+    pages: dict[str, tuple[list[int], str | None]] = {"/": ([40, 39], "30/next"), "30/next": ([30, 29], None)}
+
+    def favorites(_user: str, page: str) -> tuple[list[SimpleNamespace], str | None]:
+        requests.append(page)
+        return list(map(make_partial, pages[page][0])), pages[page][1]
+
+    downloader: Downloader = Downloader(db, SimpleNamespace(favorites=favorites), color=False)
+    fake_download_submission(downloader)
+    downloader.set_state("tom", Folder.favorites, mark=35)
+
+    assert downloader.download_user_submissions("tom", Folder.favorites, stop=1, since_update=True) == 0
+    assert requests == ["/"]
+    assert sorted(db.submissions.select(columns=[SubmissionsColumns.ID]).tuples) == [(39,), (40,)]
+    assert db.submissions[40][SubmissionsColumns.FAVORITE.name] == {"tom"}
+    assert downloader.get_state("tom", Folder.favorites)[FolderStateColumns.MARK.name] == 35
+
+
+def test_store_file(tmp_path: Path):
+    store: Path = tmp_path / ".store"
+    (file1 := tmp_path / "1" / "submission.png").parent.mkdir()
+    (file2 := tmp_path / "2" / "submission.png").parent.mkdir()
+    file1.write_bytes(b"data")
+    file2.write_bytes(b"data")
+
+    stored: Path = store_file(store, file1)
+
+    assert stored.parent.parent == store and stored.samefile(file1)
+    assert store_file(store, file2) == stored
+    assert file2.samefile(file1)
+    assert stored.stat().st_nlink == 3
+
+    release_file(store, file1)
+
+    assert not file1.exists()
+    assert file2.read_bytes() == b"data"
+    assert stored.is_file()
+
+    release_file(store, file2)
+
+    assert not file2.exists()
+    assert not stored.exists()
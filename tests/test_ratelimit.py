@@ -0,0 +1,33 @@
+from pathlib import Path
+from time import monotonic
+
+from falocalrepo.ratelimit import RateLimiter
+
+
+def test_rate_limiter_shared(tmp_path: Path):
+    limiter1: RateLimiter = RateLimiter({RateLimiter.pages: 4, RateLimiter.files: 1}, tmp_path / "ratelimit.db")
+    limiter2: RateLimiter = RateLimiter({RateLimiter.pages: 4, RateLimiter.files: 1}, tmp_path / "ratelimit.db")
+
+    start: float = monotonic()
+    for _ in range(2):
+        limiter1.acquire(RateLimiter.pages)
+        limiter2.acquire(RateLimiter.pages)
+
+    assert monotonic() - start < 0.2
+    assert limiter1.connection.execute("select TOKENS from BUCKETS where NAME = ?",
+                                       [RateLimiter.pages]).fetchone()[0] < 1
+
+    limiter2.acquire(RateLimiter.pages)
+
+    assert monotonic() - start >= 0.15
+
+
+def test_rate_limiter_buckets(tmp_path: Path):
+    limiter: RateLimiter = RateLimiter({RateLimiter.pages: 1, RateLimiter.files: 10}, tmp_path / "ratelimit.db")
+
+    start: float = monotonic()
+    limiter.acquire(RateLimiter.pages)
+    for _ in range(10):
+        limiter.acquire(RateLimiter.files)
+
+    assert monotonic() - start < 0.2